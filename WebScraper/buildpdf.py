@@ -0,0 +1,37 @@
+"""Build the course PDF from a JSONL export written by StreamingExportPipeline.
+
+    python -m WebScraper.buildpdf [export/items.jsonl] [-o course_content.pdf]
+"""
+import argparse
+import logging
+import os
+
+from scrapy.utils.project import get_project_settings
+
+from .pdf import WebscraperPipeline
+from .pipelines import read_jsonl
+
+
+def main(argv=None):
+    settings = get_project_settings()
+    parser = argparse.ArgumentParser(description="Build the course PDF from a JSONL export")
+    parser.add_argument('jsonl', nargs='?',
+                        default=os.path.join(settings.get('EXPORT_DIR') or 'export', 'items.jsonl'))
+    parser.add_argument('-o', '--output', default=settings.get('PDF_OUTPUT', "course_content.pdf"))
+    parser.add_argument('--title', help="course title for the title page and footer")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(name)s: %(message)s')
+
+    pipeline = WebscraperPipeline.from_settings(settings)
+    pipeline.output = args.output
+    if args.title:
+        pipeline.title = args.title
+    for item in read_jsonl(args.jsonl):
+        # The export may differ from what the existing PDF was built from
+        item.pop('unchanged', None)
+        pipeline.process_item(item, None)
+    pipeline.close_spider(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import json
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS visited (
+    url TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    url TEXT PRIMARY KEY,
+    sort_key TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+class CrawlCheckpoint:
+    """Durable crawl state kept in a single SQLite file.
+
+    Holds the visited URLs, the pending frontier with request priorities and
+    the items collected by the pipeline. Writes are grouped into one
+    transaction per parsed page, so after a crash the file reflects the last
+    fully processed page and a restarted crawl continues from there.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def visited_urls(self):
+        return {url for url, in self.db.execute('SELECT url FROM visited')}
+
+    def mark_visited(self, *urls):
+        for url in urls:
+            self.db.execute('INSERT OR IGNORE INTO visited (url) VALUES (?)', (url,))
+            self.db.execute('DELETE FROM frontier WHERE url = ?', (url,))
+
+    def push(self, url, priority=0):
+        """Record a request to be scheduled, unless it is pending or visited"""
+        self.db.execute(
+            'INSERT OR IGNORE INTO frontier (url, priority) '
+            'SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM visited WHERE url = ?)',
+            (url, priority, url)
+        )
+
+    def discard(self, url):
+        """Forget a pending request that the scheduler dropped"""
+        self.db.execute('DELETE FROM frontier WHERE url = ?', (url,))
+
+    def frontier(self):
+        """Pending (url, priority) pairs, highest priority first"""
+        return self.db.execute(
+            'SELECT url, priority FROM frontier ORDER BY priority DESC, rowid'
+        ).fetchall()
+
+    def add_item(self, url, sort_key, item):
+        # Keyed by URL, so re-storing a page replaces it instead of duplicating it
+        self.db.execute(
+            'INSERT OR REPLACE INTO items (url, sort_key, data) VALUES (?, ?, ?)',
+            (url, json.dumps(sort_key), json.dumps(item, ensure_ascii=False))
+        )
+
+    def items(self):
+        """Yield the stored (sort_key, item) pairs"""
+        for sort_key, data in self.db.execute('SELECT sort_key, data FROM items'):
+            yield json.loads(sort_key), json.loads(data)
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
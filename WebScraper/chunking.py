@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import re
+import sqlite3
+
+from .urls import canonicalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS config (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    url TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (url, hash)
+);
+"""
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def approx_tokens(text):
+    """Rough token count, about four characters per token for English text"""
+    return math.ceil(len(text) / 4)
+
+
+def block_markdown(block):
+    """Markdown text of a single content block, or None for unknown types"""
+    if block['type'] == 'heading':
+        return f"{'#' * min(block.get('level') or 1, 6)} {block['content']}"
+    if block['type'] == 'paragraph':
+        return block['content']
+    if block['type'] == 'code':
+        language = block.get('language') or ''
+        return f"```{'' if language == 'text' else language}\n{block['content']}\n```"
+    if block['type'] == 'list':
+        return '\n'.join(f"- {text}" for text in block['items'])
+    if block['type'] == 'reference':
+        return f"> {block['content']} ({block['parent']})"
+    return None
+
+
+def split_text(text, max_tokens):
+    """Split prose into sentences, and sentences over max_tokens at word breaks"""
+    pieces = []
+    for sentence in SENTENCE_END.split(text):
+        if approx_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        current = ''
+        for word in sentence.split():
+            candidate = f"{current} {word}" if current else word
+            if current and approx_tokens(candidate) > max_tokens:
+                pieces.append(current)
+                candidate = word
+            current = candidate
+        if current:
+            pieces.append(current)
+    return pieces
+
+
+def tail_words(text, max_tokens):
+    """Trailing words of text that fit in max_tokens"""
+    tail = ''
+    for word in reversed(text.split()):
+        candidate = f"{word} {tail}" if tail else word
+        if approx_tokens(candidate) > max_tokens:
+            break
+        tail = candidate
+    return tail
+
+
+def chunk_item(item, max_tokens=512, overlap_tokens=64):
+    """Split an item's content blocks into overlapping chunks.
+
+    Chunks never cross a heading, and a code block is never split (one
+    larger than ``max_tokens`` becomes a chunk of its own). Consecutive
+    chunks of the same section share up to ``overlap_tokens`` of text.
+    Each chunk carries the page's unit and course order, the path of
+    headings above it and a hash of its heading path and text.
+    """
+    chunks = []
+    path = []  # (level, title) of the headings above the current block
+    section = []  # (text, is_code, separator) pieces of the current section
+
+    def flush():
+        for text in pack(section, max_tokens, overlap_tokens):
+            heading_path = [title for _, title in path]
+            chunks.append({
+                'url': item['url'],
+                'unit': item.get('unit'),
+                'global_order': item.get('global_order'),
+                'heading_path': heading_path,
+                'index': len(chunks),
+                'text': text,
+                'tokens': approx_tokens(text),
+                'hash': chunk_hash(heading_path, text),
+            })
+        section.clear()
+
+    for block in item.get('content_blocks') or ():
+        text = block_markdown(block)
+        if not text:
+            continue
+        if block['type'] == 'heading':
+            flush()
+            level = block.get('level') or 1
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, block['content']))
+        if block['type'] == 'code' or block['type'] == 'list':
+            # Lists keep their line structure; code is never split
+            section.append((text, block['type'] == 'code', '\n\n'))
+        else:
+            for index, piece in enumerate(split_text(text, max_tokens)):
+                section.append((piece, False, ' ' if index else '\n\n'))
+    flush()
+    return chunks
+
+
+def pack(pieces, max_tokens, overlap_tokens):
+    """Greedily join pieces into chunk texts, repeating an overlap between them"""
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        tokens = approx_tokens(piece[0])
+        if current and size + tokens > max_tokens:
+            chunks.append(join(current))
+            current = overlap(current, overlap_tokens, max_tokens - tokens)
+            size = sum(approx_tokens(text) for text, _, _ in current)
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append(join(current))
+    return chunks
+
+
+def join(pieces):
+    return pieces[0][0] + ''.join(separator + text for text, _, separator in pieces[1:])
+
+
+def overlap(pieces, overlap_tokens, room):
+    """Trailing pieces of a finished chunk to repeat at the start of the next"""
+    budget = min(overlap_tokens, room)
+    carried = []
+    for text, is_code, separator in reversed(pieces):
+        tokens = approx_tokens(text)
+        if tokens <= budget:
+            carried.insert(0, (text, is_code, separator))
+            budget -= tokens
+            continue
+        if not is_code and not carried:
+            # A single sentence longer than the overlap: repeat its end
+            tail = tail_words(text, budget)
+            if tail:
+                carried.insert(0, (tail, False, separator))
+        break
+    return carried
+
+
+def chunk_hash(heading_path, text):
+    payload = json.dumps([heading_path, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChunkState:
+    """Hashes of the chunks emitted for each URL, kept in a SQLite file.
+
+    Lets a re-crawl emit only chunks that were not emitted before and
+    report those that disappeared. Changing the chunking configuration
+    forgets all hashes, so every chunk is emitted again.
+    """
+
+    def __init__(self, path, config):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        config = json.dumps(config, sort_keys=True)
+        row = self.db.execute("SELECT value FROM config WHERE key = 'chunking'").fetchone()
+        if row is None or row[0] != config:
+            self.db.execute('DELETE FROM chunks')
+            self.db.execute("INSERT OR REPLACE INTO config (key, value) VALUES ('chunking', ?)",
+                            (config,))
+        self.db.commit()
+
+    def hashes(self, url):
+        return {hash for hash, in self.db.execute(
+            'SELECT hash FROM chunks WHERE url = ?', (canonicalize_url(url),)
+        )}
+
+    def replace(self, url, hashes):
+        url = canonicalize_url(url)
+        self.db.execute('DELETE FROM chunks WHERE url = ?', (url,))
+        self.db.executemany('INSERT OR IGNORE INTO chunks (url, hash) VALUES (?, ?)',
+                            [(url, hash) for hash in hashes])
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,121 @@
+"""Layout of code blocks as line-numbered, page-sized flowables.
+
+ReportLab splits a Preformatted by copying the lines left over after every
+page, so one flowable holding a long listing takes time quadratic in its
+length to lay out. Here the listing is cut up front into chunks that fit on
+a page, with line numbers running on from chunk to chunk, so each chunk is
+split at most once, when it starts part way down a page.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import Preformatted, XPreformatted
+
+logger = logging.getLogger(__name__)
+
+# Highlighted lines of recently laid out listings, by content hash and language
+TOKEN_CACHE_SIZE = 256
+_token_cache = OrderedDict()
+
+
+def highlighted_lines(content, language, style='default'):
+    """Lines of content as XPreformatted markup coloured by Pygments.
+
+    Returns None when Pygments is not installed or has no lexer for the
+    language, so the caller can fall back to plain text.
+    """
+    key = (hashlib.sha256(content.encode('utf-8')).hexdigest(), language, style)
+    if key in _token_cache:
+        _token_cache.move_to_end(key)
+        return _token_cache[key]
+
+    try:
+        from pygments import lex
+        from pygments.lexers import get_lexer_by_name
+        from pygments.styles import get_style_by_name
+        from pygments.util import ClassNotFound
+    except ImportError:
+        logger.warning("Pygments is not installed; code blocks are not highlighted")
+        return None
+    try:
+        lexer = get_lexer_by_name(language or 'text', stripnl=False, ensurenl=False)
+    except ClassNotFound:
+        return None
+    token_style = get_style_by_name(style)
+    colors = {}  # Token type -> colour, looked up once per type
+
+    def markup(runs):
+        # One font tag per run of same-coloured text keeps the fragments
+        # ReportLab has to measure and draw to a minimum
+        return ''.join(f'<font color="#{color}">{escape(text)}</font>' if color else escape(text)
+                       for color, text in runs)
+
+    lines = []
+    runs = []  # [colour, text] runs of the current line
+    for token, text in lex(content, lexer):
+        if token not in colors:
+            colors[token] = token_style.style_for_token(token)['color']
+        color = colors[token]
+        for index, part in enumerate(text.split('\n')):
+            if index:
+                lines.append(markup(runs))
+                runs = []
+            if not part:
+                continue
+            if runs and (runs[-1][0] == color or part.isspace()):
+                runs[-1][1] += part
+            else:
+                runs.append([color, part])
+    lines.append(markup(runs))
+    if len(lines) != content.count('\n') + 1:
+        return None  # The lexer rewrote line endings; numbering would drift
+
+    _token_cache[key] = lines
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return lines
+
+
+def code_flowables(content, language, style, max_height, highlight=False):
+    """Flowables for a code block, each at most max_height tall.
+
+    Lines are numbered from 1 across every chunk. Only the first chunk keeps
+    the style's space before and only the last its space after, so the
+    chunks stack into one listing.
+    """
+    lines = content.split('\n')
+    markup = highlighted_lines(content, language) if highlight else None
+    if markup is not None:
+        flowable, lines = XPreformatted, markup
+    else:
+        flowable = Preformatted
+    width = max(3, len(str(len(lines))))
+    padding = style.spaceBefore + style.spaceAfter + 2 * style.borderPadding
+    per_chunk = max(1, int((max_height - padding) // style.leading))
+
+    if len(lines) <= per_chunk:
+        styles = [style]
+    else:
+        styles = [
+            ParagraphStyle(f'{style.name}First', parent=style, spaceAfter=0),
+            ParagraphStyle(f'{style.name}Middle', parent=style, spaceBefore=0, spaceAfter=0),
+            ParagraphStyle(f'{style.name}Last', parent=style, spaceBefore=0),
+        ]
+
+    chunks = []
+    for start in range(0, len(lines), per_chunk):
+        numbered = '\n'.join(
+            f'{number:<{width}} {line}'
+            for number, line in enumerate(lines[start:start + per_chunk], start + 1)
+        )
+        if len(styles) == 1 or start == 0:
+            chunk_style = styles[0]
+        elif start + per_chunk >= len(lines):
+            chunk_style = styles[2]
+        else:
+            chunk_style = styles[1]
+        chunks.append(flowable(numbered, chunk_style))
+    return chunks
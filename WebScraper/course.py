@@ -0,0 +1,217 @@
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import urljoin
+
+from .urls import canonicalize_url
+
+
+@dataclass(frozen=True)
+class CourseSection:
+    url: str
+    path: str
+    title: str
+    unit: str
+    unit_order: int  # 1-based position within the unit
+    global_order: int  # 0-based position within the whole course
+    section_type: str  # "main" or "bonus"
+    section_number: str
+    is_optional: bool
+    is_quiz: bool
+    is_conclusion: bool
+    lesson_type: str
+    next_url: str = None  # Section to crawl after this one
+    next_priority: int = 0
+
+
+class CourseIndex:
+    """Immutable lookup table from section URL to its course metadata.
+
+    Built once from a unit structure so that resolving a crawled page is a
+    single dict lookup instead of a scan over every unit and section. The
+    unit structure maps each unit, in course order, to its ``type`` ("main"
+    or "bonus") and its ordered ``sections``, each a dict with the section
+    ``path`` relative to the unit, its ``title`` and optional ``section``,
+    ``optional``, ``is_quiz`` and ``is_conclusion`` entries.
+    """
+
+    def __init__(self, base_url, unit_structure):
+        self.base_url = base_url
+        self.unit_structure = unit_structure
+        sections = []
+        global_order = 0
+        for unit, data in unit_structure.items():
+            unit_sections = data['sections']
+            for index, section in enumerate(unit_sections):
+                path = section['path']
+                is_quiz = section.get('is_quiz', False)
+                is_conclusion = section.get('is_conclusion', False)
+                next_url, next_priority = self._next_section(
+                    unit, index, unit_structure
+                )
+                sections.append(CourseSection(
+                    url=f"{base_url}{unit}/{path}",
+                    path=path,
+                    title=section['title'],
+                    unit=unit,
+                    unit_order=index + 1,
+                    global_order=global_order,
+                    section_type=data['type'],
+                    section_number=section.get('section', ''),
+                    is_optional=section.get('optional', False),
+                    is_quiz=is_quiz,
+                    is_conclusion=is_conclusion,
+                    lesson_type='Quiz' if is_quiz else 'Conclusion' if is_conclusion else 'Introduction' if 'introduction' in path.lower() else 'Content',
+                    next_url=next_url,
+                    next_priority=next_priority
+                ))
+                global_order += 1
+
+        self.sections = tuple(sections)
+        self._by_url = MappingProxyType(
+            {canonicalize_url(section.url): section for section in sections}
+        )
+
+    def _next_section(self, unit, index, unit_structure):
+        unit_sections = unit_structure[unit]['sections']
+        if index + 1 < len(unit_sections):
+            # Next section in same unit
+            return f"{self.base_url}{unit}/{unit_sections[index + 1]['path']}", 10
+
+        if unit_structure[unit]['type'] == 'main':
+            # First section of the next main unit in course order
+            units = list(unit_structure)
+            for next_unit in units[units.index(unit) + 1:]:
+                data = unit_structure[next_unit]
+                if data['type'] == 'main' and data['sections']:
+                    return f"{self.base_url}{next_unit}/{data['sections'][0]['path']}", 5
+
+        return None, 0
+
+    def get(self, url):
+        return self._by_url.get(canonicalize_url(url))
+
+    def __contains__(self, url):
+        return canonicalize_url(url) in self._by_url
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+    @classmethod
+    def from_manifest(cls, path, max_age=0):
+        """Load a cached index, or return None if it is missing or too old.
+
+        Indexes are immutable, so each version of a manifest is only parsed
+        once per process, however many spiders load it.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if max_age and time.time() - stat.st_mtime > max_age:
+            return None
+        return _load_manifest(cls, os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def save_manifest(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'base_url': self.base_url, 'units': self.unit_structure}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=32)
+def _load_manifest(cls, path, mtime_ns, size):
+    # Keyed on the file's mtime and size so a rewritten manifest is reloaded
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cls(manifest['base_url'], manifest['units'])
+
+
+def course_name(base_url):
+    """Short name of the course rooted at base_url: its last path segment"""
+    url = canonicalize_url(base_url).split('://', 1)[-1].rstrip('/')
+    return re.sub(r'[^\w.-]+', '_', url.rsplit('/', 1)[-1])
+
+
+def display_name(name):
+    """Human-readable form of a course or unit name, e.g. "Bonus Unit 1"
+    for bonus-unit1 or "Agents Course" for agents-course"""
+    words = re.sub(r'(?<=[^\W\d_])(?=\d)', ' ', name).replace('-', ' ').replace('_', ' ').split()
+    return ' '.join(word[:1].upper() + word[1:] for word in words)
+
+
+def course_path(path, course):
+    """Per-course variant of an output path: <dir>/<course>/<file>"""
+    head, tail = os.path.split(path)
+    return os.path.join(head, course, tail)
+
+
+def manifest_path(directory, base_url):
+    """Manifest file of the course rooted at base_url"""
+    name = re.sub(r'[^\w.-]+', '_', canonicalize_url(base_url).split('://', 1)[-1]).strip('_')
+    return os.path.join(directory, f"{name}.json")
+
+
+def structure_from_links(base_url, links, previous=None):
+    """Build a unit structure from (href, title) links in navigation order.
+
+    Links to ``<base_url><unit>/<path>`` become sections of their unit,
+    units and sections keeping the order of their first link. Units named
+    ``bonus...`` are bonus units. Flags a maintainer added to a previous
+    structure (section numbers, optional sections) are kept for sections
+    that still exist.
+    """
+    base_url = canonicalize_url(base_url) + '/'
+    previous = previous or {}
+    units = {}
+    seen = set()
+    for href, title in links:
+        url = canonicalize_url(href)
+        if not url.startswith(base_url) or url in seen:
+            continue
+        unit, _, path = url[len(base_url):].partition('/')
+        if not unit or not path:
+            continue
+        seen.add(url)
+        old = {section['path']: section
+               for section in previous.get(unit, {}).get('sections', ())}.get(path, {})
+        title = ' '.join((title or '').split()) or old.get('title') or path
+        lowered = f"{path} {title}".lower()
+        section = dict(old, path=path, title=title)
+        section.setdefault('is_quiz', 'quiz' in lowered)
+        section.setdefault('is_conclusion', 'conclusion' in path.lower())
+        if 'optional' in lowered:
+            section['optional'] = True
+        units.setdefault(unit, {
+            'title': previous.get(unit, {}).get('title', unit),
+            'type': 'bonus' if unit.startswith('bonus') else 'main',
+            'sections': []
+        })['sections'].append(section)
+    return units
+
+
+def navigation_links(response):
+    """(href, title) pairs of the page's navigation sidebar, in document order"""
+    links = response.css('nav a, aside a')
+    return [(urljoin(response.url, link.attrib.get('href', '')),
+             ' '.join(link.css('::text').getall()))
+            for link in links if link.attrib.get('href')]
+
+
+def sitemap_links(response):
+    """(href, title) pairs for every <loc> of a sitemap, titles left empty"""
+    return [(url.strip(), '') for url in
+            response.xpath('//*[local-name()="loc"]/text()').getall()]
@@ -0,0 +1,196 @@
+import hashlib
+import re
+from array import array
+from collections import defaultdict
+
+WORD = re.compile(r'\w+')
+
+VALUE_BITS = 56  # Bin values keep 56 bits; the top byte holds densification offsets
+VALUE_MASK = (1 << VALUE_BITS) - 1
+EMPTY = 1 << 64
+
+
+def shingles(text, size=5):
+    """Lowercased word n-grams of text; texts shorter than size give one shingle"""
+    words = WORD.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """One-permutation MinHash with densification.
+
+    Every shingle is hashed once and lands in one of ``num_perm`` bins,
+    which keep their minimum, so a signature costs one hash per shingle
+    instead of one per shingle and permutation. Empty bins borrow the value
+    of the next filled bin, offset by their distance to it.
+    """
+
+    def __init__(self, num_perm=64):
+        if not 0 < num_perm <= 256:
+            raise ValueError("num_perm must be between 1 and 256")
+        self.num_perm = num_perm
+
+    def hashes(self, shingles):
+        # A fixed hash rather than Python's per-process salted one, so the
+        # same pages give the same signatures, and decisions, on every run
+        return {int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(),
+                               'little')
+                for shingle in shingles}
+
+    def signature(self, hashes):
+        bins = [EMPTY] * self.num_perm
+        for value in hashes:
+            index = value % self.num_perm
+            value = (value // self.num_perm) & VALUE_MASK
+            if value < bins[index]:
+                bins[index] = value
+        if all(value == EMPTY for value in bins):
+            return None
+
+        # Walk right to left twice around the ring so every empty bin has
+        # seen the next filled bin
+        num_perm = self.num_perm
+        densified = list(bins)
+        borrowed, distance = EMPTY, 0
+        for i in range(2 * num_perm - 1, -1, -1):
+            value = bins[i % num_perm]
+            if value != EMPTY:
+                borrowed, distance = value, 0
+            else:
+                distance += 1
+                if i < num_perm:
+                    densified[i] = borrowed | (distance << VALUE_BITS)
+        bins = densified
+        return array('Q', bins)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures.
+
+    Signatures sharing all rows of at least one band become candidates, so
+    a lookup touches a handful of buckets instead of every stored
+    signature. Candidates are confirmed against ``threshold`` with their
+    estimated similarity, or with their exact Jaccard similarity when both
+    sides were inserted with their (small) hash sets, where densified
+    signatures overestimate.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.85):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.signatures = []
+        self.hash_sets = []
+        self.keys = []
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+
+    def query(self, signature, hashes=None):
+        """Smallest key among the stored signatures above the threshold, or None"""
+        candidates = set()
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(band_key, ()))
+        best = None
+        for index in candidates:
+            stored = self.hash_sets[index]
+            if hashes is not None and stored is not None:
+                score = jaccard(hashes, stored)
+            else:
+                score = similarity(signature, self.signatures[index])
+            if score >= self.threshold and (best is None or self.keys[index] < best):
+                best = self.keys[index]
+        return best
+
+    def insert(self, key, signature, hashes=None):
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.hash_sets.append(hashes)
+        self.keys.append(key)
+        for buckets, band_key in zip(self.buckets, self._band_keys(signature)):
+            buckets[band_key].append(index)
+
+
+class DuplicateDetector:
+    """Finds near-duplicate blocks and pages across a crawl.
+
+    The occurrence of some content earliest in course order (its page's
+    ``global_order``, then URL) is the original, whatever order pages are
+    crawled in: blocks or pages whose estimated similarity to an earlier
+    one reaches ``threshold`` are reported as its duplicates, and a copy
+    checked before an earlier one is kept, the earlier one becoming the
+    original of later copies. Blocks with fewer than ``min_words`` words,
+    and headings, are never considered duplicates, nor are pages with
+    fewer than ``page_min_words`` words in such blocks.
+    """
+
+    BLOCK_TYPES = ('paragraph', 'code', 'list')
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=16, min_words=8,
+                 page_min_words=100):
+        self.hasher = MinHasher(num_perm)
+        self.blocks = LSHIndex(num_perm, bands, threshold)
+        self.pages = LSHIndex(num_perm, bands, threshold)
+        self.min_words = min_words
+        self.page_min_words = page_min_words
+
+    def block_text(self, block):
+        if block['type'] not in self.BLOCK_TYPES:
+            return None
+        if block['type'] == 'list':
+            text = ' '.join(block.get('items') or ())
+        else:
+            text = block.get('content') or ''
+        return text if len(WORD.findall(text)) >= self.min_words else None
+
+    def check_page(self, item):
+        """Return (url, title) of an earlier near-identical page, or None.
+
+        A page that is not a duplicate is recorded as an original.
+        """
+        texts = [self.block_text(block) for block in item.get('content_blocks') or ()]
+        texts = [text for text in texts if text]
+        # A short page is mostly boilerplate; judge it block by block instead
+        if sum(len(WORD.findall(text)) for text in texts) < self.page_min_words:
+            return None
+        hashes = self.hasher.hashes(set().union(*(shingles(text) for text in texts)))
+        return self._check(self.pages, hashes, item)
+
+    def check_block(self, block, item):
+        """Return (url, title) of the page holding an earlier near-identical block"""
+        text = self.block_text(block)
+        if text is None:
+            return None
+        return self._check(self.blocks, self.hasher.hashes(shingles(text)), item)
+
+    def _check(self, index, hashes, item):
+        signature = self.hasher.signature(hashes)
+        if signature is None:
+            return None
+        # Small sets are compared exactly, which costs no more memory
+        # than their signature
+        if len(hashes) > self.hasher.num_perm:
+            hashes = None
+        order = item.get('global_order')
+        key = (order if isinstance(order, int) else float('inf'), item['url'], item.get('title') or '')
+        original = index.query(signature, hashes)
+        # An earlier block of the same page is earlier too
+        if original is not None and original[:2] <= key[:2]:
+            return original[1:]
+        index.insert(key, signature, hashes)
+        return None
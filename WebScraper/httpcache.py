@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+from time import time
+
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers BLOB NOT NULL,
+    digest TEXT NOT NULL,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_digest ON responses (digest);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+CODECS = {
+    'identity': (lambda data: data, lambda data: data),
+    'gzip': (lambda data: gzip.compress(data, mtime=0), gzip.decompress),
+}
+if zstd is not None:
+    CODECS['zstd'] = (zstd.compress, zstd.decompress)
+
+
+class RevalidatingPolicy(RFC2616Policy):
+    """Cache policy that checks every cached page with the server.
+
+    Cached responses are never served as fresh. Their ``ETag`` and
+    ``Last-Modified`` headers are sent back as ``If-None-Match`` and
+    ``If-Modified-Since``, and a ``304 Not Modified`` answer serves the
+    cached body flagged as ``revalidated``. Pages without validators are
+    simply downloaded again. Every successful response is stored, whatever
+    its cache headers say.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.ignore_http_codes = [int(code) for code in settings.getlist('HTTPCACHE_IGNORE_HTTP_CODES')]
+
+    def should_cache_response(self, response, request):
+        return response.status != 304 and response.status not in self.ignore_http_codes
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        valid = super().is_cached_response_valid(cachedresponse, response, request)
+        if valid and response.status == 304:
+            # Unlike a cached copy served after a server error, the server
+            # confirmed this one is current
+            cachedresponse.flags.append('revalidated')
+        return valid
+
+
+class SQLiteCacheStorage:
+    """HTTP cache storage keeping every response in one SQLite file.
+
+    Bodies are compressed (zstd when available, gzip otherwise) and stored
+    once per distinct content hash, so pages served at several URLs share a
+    single copy. Lookups are one indexed query by request fingerprint. When
+    ``HTTPCACHE_MAX_SIZE`` is set, the least recently used responses are
+    evicted once the stored data grows past it.
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.max_size = settings.getint('HTTPCACHE_MAX_SIZE')
+        self.codec = settings.get('HTTPCACHE_COMPRESSION') or ('zstd' if zstd else 'gzip')
+        if self.codec not in CODECS:
+            raise ValueError(f"Unsupported HTTPCACHE_COMPRESSION: {self.codec!r}")
+        self.db = None
+        self.size = 0
+
+    def open_spider(self, spider):
+        path = os.path.join(self.cachedir, f'{spider.name}.sqlite3')
+        self.db = sqlite3.connect(path)
+        # Must be set before the first table is created to take effect
+        self.db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.size = self._stored_size()
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        logger.debug("Using SQLite cache storage in %(path)s (%(codec)s)",
+                     {'path': path, 'codec': self.codec}, extra={'spider': spider})
+
+    def close_spider(self, spider):
+        self.db.commit()
+        self.db.close()
+
+    def retrieve_response(self, spider, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+        row = self.db.execute(
+            'SELECT r.url, r.status, r.headers, r.stored, b.codec, b.data '
+            'FROM responses r JOIN bodies b ON b.digest = r.digest '
+            'WHERE r.fingerprint = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None  # not cached
+        url, status, raw_headers, stored, codec, data = row
+        if 0 < self.expiration_secs < time() - stored:
+            return None  # expired
+        # Committed along with the next store, or at close
+        self.db.execute('UPDATE responses SET accessed = ? WHERE fingerprint = ?',
+                        (time(), key))
+
+        body = CODECS[codec][1](data)
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        request.meta['cache_timestamp'] = stored
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        key = self._fingerprinter.fingerprint(request).hex()
+        digest = hashlib.sha256(response.body).hexdigest()
+        raw_headers = headers_dict_to_raw(response.headers) or b''
+        now = time()
+
+        if self.db.execute('SELECT 1 FROM bodies WHERE digest = ?', (digest,)).fetchone() is None:
+            data = CODECS[self.codec][0](response.body)
+            self.db.execute(
+                'INSERT INTO bodies (digest, codec, size, data) VALUES (?, ?, ?, ?)',
+                (digest, self.codec, len(data), data)
+            )
+            self.size += len(data)
+        old = self.db.execute('SELECT digest FROM responses WHERE fingerprint = ?',
+                              (key,)).fetchone()
+        self.db.execute(
+            'INSERT OR REPLACE INTO responses '
+            '(fingerprint, url, status, headers, digest, stored, accessed) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, response.url, response.status, raw_headers, digest, now, now)
+        )
+        self.size += len(raw_headers)
+        if old is not None and old[0] != digest:
+            self._drop_body(old[0])
+
+        if self.max_size and self.size > self.max_size:
+            # The running size only over-estimates, so recount before evicting
+            self.size = self._stored_size()
+            if self.size > self.max_size:
+                self._evict(spider)
+        self.db.commit()
+
+    def _stored_size(self):
+        bodies, = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()
+        headers, = self.db.execute(
+            'SELECT COALESCE(SUM(LENGTH(headers)), 0) FROM responses'
+        ).fetchone()
+        return bodies + headers
+
+    def _drop_body(self, digest):
+        """Delete a body once no response refers to it any more"""
+        if self.db.execute('SELECT 1 FROM responses WHERE digest = ?', (digest,)).fetchone() is None:
+            row = self.db.execute('SELECT size FROM bodies WHERE digest = ?', (digest,)).fetchone()
+            if row is not None:
+                self.db.execute('DELETE FROM bodies WHERE digest = ?', (digest,))
+                self.size -= row[0]
+
+    def _evict(self, spider):
+        # Free a margin below the limit so eviction doesn't run on every store
+        target = self.max_size * 0.9
+        evicted = 0
+        candidates = self.db.execute(
+            'SELECT fingerprint, digest, LENGTH(headers) FROM responses ORDER BY accessed'
+        ).fetchall()
+        for key, digest, header_size in candidates:
+            if self.size <= target:
+                break
+            self.db.execute('DELETE FROM responses WHERE fingerprint = ?', (key,))
+            self.size -= header_size
+            evicted += 1
+            self._drop_body(digest)
+        self.db.execute('PRAGMA incremental_vacuum').fetchall()
+        spider.crawler.stats.inc_value('httpcache/evicted', evicted)
+        logger.debug("Evicted %(count)d cached responses", {'count': evicted},
+                     extra={'spider': spider})
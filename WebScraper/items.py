@@ -1,12 +1,17 @@
+import sys
+from collections.abc import KeysView, MutableMapping
+
 import scrapy
+from itemadapter import ItemAdapter
+from itemadapter.adapter import AdapterInterface
 
 class ContentBlock(scrapy.Item):
-    type = scrapy.Field()  # heading, paragraph, list, code, table
+    type = scrapy.Field()  # heading, paragraph, list, code, table, reference
     content = scrapy.Field()
     level = scrapy.Field()  # For headings (h1, h2, etc.) or list nesting
     language = scrapy.Field()  # For code blocks
     items = scrapy.Field()  # For list items
-    parent = scrapy.Field()  # For nested structures
+    parent = scrapy.Field()  # For nested structures; original page URL for references
 
 class WebscraperItem(scrapy.Item):
     url = scrapy.Field()
@@ -16,6 +21,7 @@ class WebscraperItem(scrapy.Item):
     parent_url = scrapy.Field()
     
     # Course structure fields
+    course = scrapy.Field()  # Course name, e.g., "agents-course"
     unit = scrapy.Field()  # e.g., "unit0", "unit1", "bonus-unit1"
     unit_order = scrapy.Field()  # Order within the unit
     section_type = scrapy.Field()  # "main" or "bonus"
@@ -25,3 +31,127 @@ class WebscraperItem(scrapy.Item):
     is_conclusion = scrapy.Field()  # Boolean to mark conclusion sections
     lesson_type = scrapy.Field()  # e.g., "Introduction", "Exercise", "Quiz"
     global_order = scrapy.Field()  # Overall order in the course
+    unchanged = scrapy.Field()  # Revalidated with the server (304 Not Modified)
+
+
+class CompactItem(MutableMapping):
+    """Slotted stand-in for a scrapy.Item, without the per-instance dict.
+
+    Each of ``fields`` is stored in a slot of the same name with a leading
+    underscore (so that a field can be called ``items``), and a field that
+    was never set is an empty slot, so conversion to and from
+    ``item_class`` keeps exactly the fields that are set. The values of
+    ``interned`` fields are interned, so repeated strings such as a block
+    type are stored once.
+    """
+    __slots__ = ()
+    fields = ()
+    item_class = None
+    interned = ()
+
+    def __init__(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    @classmethod
+    def from_item(cls, item):
+        """Copy of a dict, scrapy.Item or compact item"""
+        return cls(ItemAdapter(item).items()) if not isinstance(item, cls) else cls(item)
+
+    def to_item(self):
+        return self.item_class(self)
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        try:
+            return getattr(self, '_' + key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError(f"{type(self).__name__} does not support field: {key}")
+        if key in self.interned and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, '_' + key, value)
+
+    def __delitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        try:
+            delattr(self, '_' + key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return (key for key in self.fields if hasattr(self, '_' + key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Block(CompactItem):
+    """Compact ContentBlock"""
+    fields = ('type', 'content', 'level', 'language', 'items', 'parent')
+    __slots__ = tuple('_' + name for name in fields)
+    item_class = ContentBlock
+    interned = ('type', 'language')
+
+
+class Page(CompactItem):
+    """Compact WebscraperItem, holding Block content blocks"""
+    fields = ('url', 'title', 'course', 'content_blocks', 'depth', 'parent_url', 'unit',
+              'unit_order', 'section_type', 'section_number', 'is_optional', 'is_quiz',
+              'is_conclusion', 'lesson_type', 'global_order', 'unchanged')
+    __slots__ = tuple('_' + name for name in fields)
+    item_class = WebscraperItem
+    interned = ('course', 'unit', 'section_type', 'lesson_type')
+
+    def __setitem__(self, key, value):
+        if key == 'content_blocks' and value is not None:
+            value = [block if isinstance(block, Block) else Block.from_item(block)
+                     for block in value]
+        super().__setitem__(key, value)
+
+    def to_item(self):
+        item = self.item_class(self)
+        if item.get('content_blocks') is not None:
+            item['content_blocks'] = [block.to_item() for block in item['content_blocks']]
+        return item
+
+
+class CompactItemAdapter(AdapterInterface):
+    """Lets Scrapy, its exporters and ItemAdapter handle compact items"""
+
+    @classmethod
+    def is_item_class(cls, item_class):
+        return issubclass(item_class, CompactItem)
+
+    @classmethod
+    def get_field_names_from_class(cls, item_class):
+        return list(item_class.fields)
+
+    def field_names(self):
+        return KeysView(dict.fromkeys(self.item.fields))
+
+    def __getitem__(self, field_name):
+        return self.item[field_name]
+
+    def __setitem__(self, field_name, value):
+        self.item[field_name] = value
+
+    def __delitem__(self, field_name):
+        del self.item[field_name]
+
+    def __iter__(self):
+        return iter(self.item)
+
+    def __len__(self):
+        return len(self.item)
+
+
+ItemAdapter.ADAPTER_CLASSES.appendleft(CompactItemAdapter)
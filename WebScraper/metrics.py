@@ -0,0 +1,107 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Summary:
+    """Count, sum, min and max of an observed value"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class CrawlMetrics:
+    """Per-stage timings, counters and per-URL download records for one crawl.
+
+    Filled in by the middlewares, the spider and the pipeline, and exported
+    at spider close as a JSON report and a Prometheus text-format file.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.summaries = defaultdict(Summary)
+        self.counters = defaultdict(int)
+        self.downloads = {}  # url -> latency, bytes, status, cached
+
+    def observe(self, name, value):
+        self.summaries[name].observe(value)
+
+    def inc(self, name, value=1):
+        self.counters[name] += value
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def record_download(self, url, latency, size, status, cached):
+        self.downloads[url] = {
+            'latency_seconds': latency,
+            'bytes': size,
+            'status': status,
+            'cached': cached,
+        }
+
+    def to_dict(self):
+        return {
+            'started': self.started,
+            'elapsed_seconds': time.time() - self.started,
+            'counters': dict(self.counters),
+            'summaries': {name: summary.to_dict() for name, summary in self.summaries.items()},
+            'downloads': self.downloads,
+        }
+
+    def to_prometheus(self, prefix='webscraper'):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            metric = f'{prefix}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        for name, summary in sorted(self.summaries.items()):
+            metric = f'{prefix}_{name}'
+            lines.append(f'# TYPE {metric} summary')
+            lines.append(f'{metric}_count {summary.count}')
+            lines.append(f'{metric}_sum {summary.total}')
+            if summary.count:
+                lines.append(f'# TYPE {metric}_min gauge')
+                lines.append(f'{metric}_min {summary.min}')
+                lines.append(f'# TYPE {metric}_max gauge')
+                lines.append(f'{metric}_max {summary.max}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, json_path=None, prometheus_path=None):
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        if prometheus_path:
+            with open(prometheus_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+
+
+def metrics_for(spider):
+    """Return the spider's CrawlMetrics, creating it on first use"""
+    if getattr(spider, 'metrics', None) is None:
+        spider.metrics = CrawlMetrics()
+    return spider.metrics
@@ -3,22 +3,37 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import mimetypes
+import posixpath
+import time
+from urllib.parse import urlparse
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured, StopDownload
+from scrapy.linkextractors import IGNORED_EXTENSIONS
 
-# useful for handling different item types with a single interface
-from itemadapter import is_item, ItemAdapter
+from .metrics import metrics_for
 
 
 class WebscraperSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    # Times the spider callbacks and exports the crawl metrics when the
+    # spider closes (after the pipelines have finished rendering).
+
+    def __init__(self, metrics, json_path=None, prometheus_path=None):
+        self.metrics = metrics
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(
+            metrics_for(crawler.spider),
+            json_path=crawler.settings.get('METRICS_JSON_FILE'),
+            prometheus_path=crawler.settings.get('METRICS_PROMETHEUS_FILE')
+        )
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_spider_input(self, response, spider):
@@ -29,19 +44,47 @@ class WebscraperSpiderMiddleware:
         return None
 
     def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+        # Only the time spent inside the callback counts, not the time
+        # downstream consumers take between items
+        elapsed = 0.0
+        outputs = 0
+        iterator = iter(result)
+        while True:
+            started = time.perf_counter()
+            try:
+                i = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - started
+                break
+            elapsed += time.perf_counter() - started
+            outputs += 1
+            yield i
+        self.metrics.observe('parse_seconds', elapsed)
+        self.metrics.observe('parse_outputs', outputs)
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
+    async def process_spider_output_async(self, response, result, spider):
+        elapsed = 0.0
+        outputs = 0
+        iterator = result.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                i = await iterator.__anext__()
+            except StopAsyncIteration:
+                elapsed += time.perf_counter() - started
+                break
+            elapsed += time.perf_counter() - started
+            outputs += 1
             yield i
+        self.metrics.observe('parse_seconds', elapsed)
+        self.metrics.observe('parse_outputs', outputs)
 
     def process_spider_exception(self, response, exception, spider):
         # Called when a spider or process_spider_input() method
         # (from other spider middleware) raises an exception.
 
         # Should return either None or an iterable of Request or item objects.
-        pass
+        self.metrics.inc('parse_errors')
 
     def process_start_requests(self, start_requests, spider):
         # Called with the start requests of the spider, and works
@@ -55,16 +98,25 @@ class WebscraperSpiderMiddleware:
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
 
+    def spider_closed(self, spider, reason):
+        self.metrics.export(self.json_path, self.prometheus_path)
+        if self.json_path or self.prometheus_path:
+            spider.logger.info("Crawl metrics written to %s",
+                               ', '.join(p for p in (self.json_path, self.prometheus_path) if p))
+
 
 class WebscraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    # Records download latency, response size and HTTP cache hits per URL.
+    # Sits before HttpCacheMiddleware, so cached responses pass through
+    # process_response too and are counted as hits.
+
+    def __init__(self, metrics):
+        self.metrics = metrics
 
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        s = cls(metrics_for(crawler.spider))
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
@@ -78,6 +130,7 @@ class WebscraperDownloaderMiddleware:
         # - or return a Request object
         # - or raise IgnoreRequest: process_exception() methods of
         #   installed downloader middleware will be called
+        request.meta['download_started'] = time.perf_counter()
         return None
 
     def process_response(self, request, response, spider):
@@ -87,6 +140,15 @@ class WebscraperDownloaderMiddleware:
         # - return a Response object
         # - return a Request object
         # - or raise IgnoreRequest
+        started = request.meta.get('download_started')
+        latency = time.perf_counter() - started if started is not None else 0.0
+        cached = 'cached' in response.flags
+        size = len(response.body)
+
+        self.metrics.observe('download_latency_seconds', latency)
+        self.metrics.observe('response_bytes', size)
+        self.metrics.inc('httpcache_hits' if cached else 'httpcache_misses')
+        self.metrics.record_download(response.url, latency, size, response.status, cached)
         return response
 
     def process_exception(self, request, exception, spider):
@@ -97,7 +159,134 @@ class WebscraperDownloaderMiddleware:
         # - return None: continue processing this exception
         # - return a Response object: stops process_exception() chain
         # - return a Request object: stops process_exception() chain
-        pass
+        self.metrics.inc('download_errors')
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class AssetFilterMiddleware:
+    # Keeps images, notebooks, archives and other non-HTML links from being
+    # downloaded and cached only to be discarded by the spider. Requests
+    # are rejected up front by URL extension or guessed MIME type, and
+    # downloads are aborted as soon as their headers show a non-HTML
+    # Content-Type or they grow past the size cap. URLs with an unknown
+    # extension can be checked with a HEAD request first. Every rejection
+    # is counted under asset_filter/<reason>.
+    #
+    # robots.txt and requests with meta['dont_filter_assets'] (e.g. the
+    # spider's sitemap.xml) are let through. Sits before HttpCacheMiddleware
+    # so rejected requests never reach the cache.
+
+    # Extensions of course pages and other HTML documents
+    HTML_EXTENSIONS = {'', 'html', 'htm', 'xhtml', 'shtml', 'php', 'asp', 'aspx', 'jsp'}
+    HTML_TYPES = (b'text/html', b'application/xhtml+xml')
+    # Assets linked from course pages on top of Scrapy's usual list
+    EXTRA_EXTENSIONS = ['ipynb', 'json', 'jsonl', 'csv', 'parquet', 'safetensors',
+                        'gz', 'tgz', 'whl', 'txt', 'yaml', 'yml']
+
+    def __init__(self, stats, extensions=(), max_size=0, head_probe=False):
+        self.stats = stats
+        self.extensions = {ext.lower().lstrip('.') for ext in
+                           [*IGNORED_EXTENSIONS, *self.EXTRA_EXTENSIONS, *extensions]}
+        self.max_size = max_size
+        self.head_probe = head_probe
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ASSET_FILTER_ENABLED'):
+            raise NotConfigured('ASSET_FILTER_ENABLED is not set')
+        s = cls(
+            crawler.stats,
+            extensions=settings.getlist('ASSET_FILTER_EXTENSIONS'),
+            max_size=settings.getint('ASSET_FILTER_MAX_SIZE'),
+            head_probe=settings.getbool('ASSET_FILTER_HEAD_PROBE')
+        )
+        crawler.signals.connect(s.headers_received, signal=signals.headers_received)
+        if s.max_size:
+            crawler.signals.connect(s.bytes_received, signal=signals.bytes_received)
+        return s
+
+    def exempt(self, request):
+        return (request.meta.get('dont_filter_assets')
+                or urlparse(request.url).path == '/robots.txt')
+
+    def reject(self, request, reason):
+        self.stats.inc_value(f'asset_filter/{reason}')
+        raise IgnoreRequest(f"Not an HTML page ({reason}): {request.url}")
+
+    def process_request(self, request, spider):
+        if self.exempt(request) or request.meta.get('asset_probe'):
+            return None
+        path = urlparse(request.url).path
+        extension = posixpath.splitext(path)[1].lower().lstrip('.')
+        if extension in self.extensions:
+            self.reject(request, 'extension')
+        mime_type, _ = mimetypes.guess_type(path)
+        if mime_type and mime_type.encode() not in self.HTML_TYPES:
+            self.reject(request, 'mime_type')
+        if (self.head_probe and extension not in self.HTML_EXTENSIONS
+                and not request.meta.get('asset_probed')):
+            # Unknown extension: ask for the headers before the body
+            self.stats.inc_value('asset_filter/head_probes')
+            return request.replace(method='HEAD', dont_filter=True,
+                                   meta=dict(request.meta, asset_probe=True))
+        return None
+
+    def process_response(self, request, response, spider):
+        if self.exempt(request):
+            return response
+        # Redirects and 304 Not Modified don't carry the page themselves
+        if 300 <= response.status < 400:
+            reason = None
+        else:
+            reason = self.check_headers(response.headers, len(response.body))
+        if request.meta.get('asset_probe'):
+            if reason and response.status < 400:
+                self.reject(request, reason)
+            # HTML, or a server that doesn't answer HEAD: fetch the page
+            meta = dict(request.meta, asset_probed=True)
+            del meta['asset_probe']
+            return request.replace(method='GET', dont_filter=True, meta=meta)
+        if reason:
+            # Cached responses and handlers that don't send the signals
+            self.reject(request, reason)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        # A download stopped by the signal handlers below
+        reason = request.meta.get('asset_rejected')
+        if reason and isinstance(exception, StopDownload):
+            self.reject(request, reason)
+
+    def check_headers(self, headers, length=None):
+        """Rejection reason for a response with these headers, or None"""
+        content_type = headers.get('Content-Type')
+        if content_type and content_type.split(b';')[0].strip().lower() not in self.HTML_TYPES:
+            return 'content_type'
+        if self.max_size and length is not None and length > self.max_size:
+            return 'too_large'
+        return None
+
+    def headers_received(self, headers, body_length, request, spider):
+        if self.exempt(request) or request.meta.get('asset_probe'):
+            return
+        # The signal has no status: leave redirects, and revalidations that
+        # may be answered with a 304, to process_response
+        if (headers.get('Location') or request.headers.get('If-None-Match')
+                or request.headers.get('If-Modified-Since')):
+            return
+        # body_length is a placeholder, not an int, when no length was sent
+        reason = self.check_headers(headers, body_length if isinstance(body_length, int) else None)
+        if reason:
+            request.meta['asset_rejected'] = reason
+            raise StopDownload(fail=True)
+
+    def bytes_received(self, data, request, spider):
+        # Bodies sent without a Content-Length
+        received = request.meta.get('asset_bytes', 0) + len(data)
+        request.meta['asset_bytes'] = received
+        if received > self.max_size and not self.exempt(request):
+            request.meta['asset_rejected'] = 'too_large'
+            raise StopDownload(fail=True)
@@ -0,0 +1,691 @@
+"""PDF output: lays the scraped course out as a single PDF.
+
+Kept apart from the other pipelines so that ReportLab and pypdf are only
+imported when the PDF pipeline is enabled.
+"""
+from itemadapter import ItemAdapter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import (
+    Paragraph, Spacer, PageBreak, ListFlowable, ListItem
+)
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_LEFT, TA_RIGHT
+from twisted.internet.threads import deferToThread
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import chain, groupby
+from multiprocessing import get_context
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from functools import cached_property
+from xml.sax.saxutils import escape
+from .codeblocks import code_flowables
+from .course import course_path, display_name
+from .items import Page
+from .rendering import (
+    FragmentCache, OutlineDocTemplate, OutlineEntry, OutlineHeading, assemble_pdf, fingerprint
+)
+from .spill import ItemSpillBuffer
+from .pipelines import CourseRouting
+
+logger = logging.getLogger(__name__)
+
+
+class WebscraperPipeline(CourseRouting):
+    def __init__(self, spill_threshold=500, spill_dir=None, fragment_cache_dir=None,
+                 render_workers=1, output="course_content.pdf", title=None,
+                 background=False, code_highlight=False, fragment_cache_max_size=0,
+                 include_bonus=False):
+        super().__init__()
+        self.output = output
+        # Named after the course of the items when not given
+        self.title = title
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        # Items are buffered in (unit, unit_order) order and spilled to disk
+        # once spill_threshold of them are held in memory
+        self.items = ItemSpillBuffer(threshold=spill_threshold, directory=spill_dir)
+        self.outline = []
+        # Rendered pages are reused across runs when a cache dir is configured
+        self.fragment_cache = (FragmentCache(fragment_cache_dir, fragment_cache_max_size)
+                               if fragment_cache_dir else None)
+        self.used_fragments = set()  # Keys of the fragments of the last build
+        # Bonus units are laid out in their place in the course, whatever
+        # the number of workers
+        self.include_bonus = include_bonus
+        # More than one worker renders each unit in its own process
+        self.render_workers = render_workers
+        # With background rendering, pages are laid out on render_workers
+        # processes as they arrive instead of when the spider closes
+        self.background = background
+        self.renderer = None
+        self.prerendered = {}  # Fragment key -> Future of its background render
+        self.temporary_cache = False
+        # Colour code blocks by language with Pygments, when installed
+        self.code_highlight = code_highlight
+        self.checkpoint = None
+        self.metrics = None
+        self.stats = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls.from_settings(crawler.settings)
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            spill_threshold=settings.getint('PIPELINE_SPILL_THRESHOLD', 500),
+            spill_dir=settings.get('PIPELINE_SPILL_DIR'),
+            fragment_cache_dir=settings.get('PDF_FRAGMENT_CACHE_DIR'),
+            render_workers=settings.getint('PDF_RENDER_WORKERS', 1),
+            output=settings.get('PDF_OUTPUT', "course_content.pdf"),
+            title=settings.get('PDF_TITLE'),
+            background=settings.getbool('PDF_RENDER_BACKGROUND'),
+            code_highlight=settings.getbool('PDF_CODE_HIGHLIGHT'),
+            fragment_cache_max_size=settings.getint('PDF_FRAGMENT_CACHE_MAX_SIZE', 0),
+            include_bonus=settings.getbool('PDF_INCLUDE_BONUS_UNITS')
+        )
+
+    def open_spider(self, spider):
+        # Items collected before an interrupted run are restored from the
+        # spider's checkpoint; the spider won't parse those pages again
+        self.checkpoint = getattr(spider, 'checkpoint', None)
+        self.metrics = getattr(spider, 'metrics', None)
+        if self.background:
+            if self.fragment_cache is None:
+                # Background fragments need somewhere to go until the build
+                self.fragment_cache = FragmentCache(tempfile.mkdtemp(prefix='webscraper-fragments-'))
+                self.temporary_cache = True
+            self.renderer = ProcessPoolExecutor(max_workers=self.render_workers,
+                                                mp_context=get_context('spawn'))
+        self.open_courses(spider)
+        if self.checkpoint:
+            for _, item in self.checkpoint.items():
+                self.route(item).collect(self.item_key(item), item)
+
+    def for_course(self, name):
+        pipeline = type(self)(
+            spill_threshold=self.spill_threshold,
+            spill_dir=self.spill_dir and os.path.join(self.spill_dir, name),
+            fragment_cache_dir=self.fragment_cache and self.fragment_cache.directory,
+            render_workers=self.render_workers,
+            output=course_path(self.output, name),
+            title=display_name(name),
+            background=self.background,
+            code_highlight=self.code_highlight,
+            include_bonus=self.include_bonus
+        )
+        pipeline.checkpoint = self.checkpoint
+        pipeline.metrics = self.metrics
+        pipeline.renderer = self.renderer
+        return pipeline
+
+    def prerender(self, unit, item):
+        """Start laying out an item, and its unit header, on the renderer"""
+        if self.renderer is None or not self.includes(item):
+            return
+        jobs = [(fingerprint('unit', unit), ('unit', unit))]
+        if not item.get('unchanged'):
+            # Unchanged pages are only needed if something else changed;
+            # the build renders them then if they aren't cached
+            item = ItemAdapter(item).asdict()
+            jobs.append((self.fragment_key(item), ('item', item)))
+        for key, job in jobs:
+            if key in self.prerendered or self.fragment_cache.get(key) is not None:
+                continue
+            self.prerendered[key] = self.renderer.submit(
+                render_fragments, [(key, job)], self.fragment_cache.directory, self.code_highlight
+            )
+            self.inc_stat('pdf/fragments_prerendered')
+
+    def fragment_key(self, item):
+        return fingerprint(item['url'], item['title'], item['content_blocks'], self.code_highlight)
+
+    def timer(self, name):
+        """Time a stage into the crawl metrics, when instrumentation is on"""
+        return self.metrics.timer(name) if self.metrics else nullcontext()
+
+    def process_item(self, item, spider):
+        with self.timer('pipeline_process_item_seconds'):
+            adapter = ItemAdapter(item)
+            pipeline = self.route(adapter)
+            pipeline.collect(self.item_key(adapter), item)
+            if adapter.get('unchanged'):
+                pipeline.inc_stat('pipeline/items_unchanged')
+            else:
+                pipeline.inc_stat('pipeline/items_changed')
+        return item
+
+    def collect(self, key, item):
+        """Hold a scraped or restored item until the PDF is built"""
+        if self.title is None and item.get('course'):
+            self.title = display_name(item['course'])
+        # Held as a compact copy
+        self.items.add(key, Page.from_item(item))
+        self.prerender(key[2], item)
+
+    def item_key(self, item):
+        unit = item.get('unit', '')
+        if unit:
+            # unit_order and global_order come from the course structure
+            return self.sort_key(unit, item)
+        return self.sort_key(f"depth_{item.get('depth', 0)}", item)
+
+    def sort_key(self, bucket, item):
+        # Units in course order, placed by the global_order of their first
+        # section, then any other bucket by name. Within a bucket items
+        # follow their unit_order, then their course order.
+        order, unit_order = item.get('global_order'), item.get('unit_order')
+        if isinstance(order, int) and isinstance(unit_order, int):
+            key = [0, order - unit_order + 1, bucket]
+        else:
+            key = [1, 0, bucket]
+        return key + [item.get('unit_order', float('inf')),
+                      item.get('global_order', float('inf'))]
+    
+    def create_styles(self):
+        styles = getSampleStyleSheet()
+        
+        # Modify existing heading style
+        styles['Heading1'].fontSize = 24
+        styles['Heading1'].spaceAfter = 22
+        styles['Heading1'].spaceBefore = 22
+        styles['Heading1'].alignment = TA_LEFT
+        
+        # Table of Contents style
+        styles.add(
+            ParagraphStyle(
+                name='TOCEntry',
+                parent=styles['Normal'],
+                fontSize=12,
+                leading=16,
+                spaceBefore=6,
+                spaceAfter=6,
+            )
+        )
+        
+        # Code block style with better formatting
+        styles.add(
+            ParagraphStyle(
+                name='CodeBlock',
+                fontName='Courier',
+                fontSize=9,
+                leading=12,
+                textColor=colors.black,
+                backColor=colors.lightgrey,
+                leftIndent=20,
+                rightIndent=20,
+                spaceBefore=10,
+                spaceAfter=10,
+                firstLineIndent=0,
+                borderWidth=1,
+                borderColor=colors.grey,
+                borderPadding=5
+            )
+        )
+        
+        # URL style
+        styles.add(
+            ParagraphStyle(
+                name='SourceURL',
+                parent=styles['Italic'],
+                textColor=colors.blue,
+                fontSize=10,
+                spaceBefore=5,
+                spaceAfter=20
+            )
+        )
+        
+        # List style with better indentation
+        styles.add(
+            ParagraphStyle(
+                name='BulletPoint',
+                parent=styles['Normal'],
+                leftIndent=20,
+                spaceBefore=5,
+                spaceAfter=5,
+                bulletIndent=10,
+                firstLineIndent=0
+            )
+        )
+        
+        # Right-aligned page numbers in the table of contents
+        styles.add(
+            ParagraphStyle(
+                name='TOCPageNumber',
+                parent=styles['TOCEntry'],
+                alignment=TA_RIGHT
+            )
+        )
+        
+        # Add custom heading styles for levels 2-6
+        for i in range(2, 7):
+            styles.add(
+                ParagraphStyle(
+                    name=f'CustomHeading{i}',
+                    parent=styles['Heading1'],
+                    fontSize=24-(i*2),
+                    spaceAfter=22-(i*2),
+                    spaceBefore=22-(i*2),
+                    leftIndent=(i-1)*10  # Increase indentation for sub-headings
+                )
+            )
+        
+        return styles
+    
+    def process_content_block(self, block, styles):
+        if block['type'] == 'heading':
+            style_name = 'Heading1' if block['level'] == 1 else f'CustomHeading{block["level"]}'
+            # Lets the document template report which page the heading is on
+            heading = OutlineHeading(
+                block['content'],
+                styles[style_name],
+                outline_index=len(self.outline)
+            )
+            self.outline.append((block['content'], block['level']))
+            return heading
+            
+        elif block['type'] == 'paragraph':
+            return Paragraph(
+                block['content'],
+                styles['Normal']
+            )
+            
+        elif block['type'] == 'code':
+            # Line-numbered, in chunks that fit on a page
+            return code_flowables(
+                block['content'],
+                block.get('language'),
+                styles['CodeBlock'],
+                self.frame_height,
+                highlight=self.code_highlight
+            )
+            
+        elif block['type'] == 'reference':
+            return Paragraph(
+                f'<i>{escape(block["content"])}</i> '
+                f'(<link href="{escape(block["parent"])}" color="blue">{escape(block["parent"])}</link>)',
+                styles['Normal']
+            )
+
+        elif block['type'] == 'list':
+            items = []
+            for item_text in block['items']:
+                items.append(
+                    ListItem(
+                        Paragraph(item_text, styles['BulletPoint']),
+                        value='bullet'
+                    )
+                )
+            return ListFlowable(
+                items,
+                bulletType='bullet',
+                start='bullet',
+                leftIndent=20,
+                bulletFontSize=8,
+                bulletOffsetY=2
+            )
+            
+        return None
+
+    def create_header_footer(self, canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Times-Roman', 9)
+        
+        # Footer with page number
+        canvas.drawString(doc.leftMargin, 0.75 * inch, self.title)
+        page_num = canvas.getPageNumber()
+        canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, 0.75 * inch,
+                             f"Page {page_num}")
+        
+        canvas.restoreState()
+    
+    def create_toc(self, styles, pages=None, links=None):
+        """Table of contents of self.outline, with page numbers when pages are given.
+
+        With ``pages``, entries link to their page and record where they were
+        drawn in ``links``. Without, their page numbers and links are filled
+        in by an OutlineDocTemplate given the outline, in the same pass.
+        """
+        content = [Paragraph("Table of Contents", styles['Heading1'])]
+        
+        for index, (title, level) in enumerate(self.outline):
+            indent = (level - 1) * 20
+            entry = Paragraph(
+                f"{'&nbsp;' * indent}{title}",
+                styles['TOCEntry']
+            )
+            if pages is not None:
+                # Title and page number side by side, linked to the page
+                entry = OutlineEntry(entry, index, pages[index], styles['TOCPageNumber'],
+                                     0.6 * inch, target=pages[index] - 1, links=links)
+            else:
+                entry = OutlineEntry(entry, index, None, styles['TOCPageNumber'],
+                                     0.6 * inch, target=OutlineDocTemplate.destination(index))
+            content.append(entry)
+        
+        content.append(PageBreak())
+        return content
+    
+    @cached_property
+    def frame_height(self):
+        # Height left for flowables on a page, inside the frame's 6pt padding
+        return self.create_document(io.BytesIO()).height - 12
+
+    def create_document(self, output, **kwargs):
+        return OutlineDocTemplate(
+            output,
+            pagesize=letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=72,
+            **kwargs
+        )
+
+    def create_title_page(self, styles):
+        return [
+            Paragraph(self.title, styles['Heading1']),
+            Spacer(1, 30),
+            PageBreak()
+        ]
+
+    def create_unit_header(self, unit, styles):
+        return [
+            Paragraph(display_name(unit), styles['Heading1']),
+            PageBreak()
+        ]
+
+    def iter_units(self):
+        """Yield (unit, items) for every unit in the PDF, in course order"""
+        for unit, records in groupby(self.items, key=lambda record: record[0][2]):
+            items = (item for _, item in records)
+            first = next(items)
+            if self.includes(first):
+                yield unit, chain([first], items)
+
+    def includes(self, item):
+        """Whether the unit of item is in the PDF: main units, and bonus
+        units when include_bonus is set"""
+        section_type = item.get('section_type')
+        return section_type == 'main' or (self.include_bonus and section_type == 'bonus')
+
+    def close_spider(self, spider):
+        if self.renderer is not None:
+            # Waiting for the last background renders and assembling the PDF
+            # would block the reactor
+            return deferToThread(self.finish)
+        self.finish()
+
+    def finish(self):
+        try:
+            for pipeline in self.instances():
+                pipeline.write_output()
+            if self.fragment_cache is not None and not self.temporary_cache:
+                # Every course shares the cache, so it is pruned once all of
+                # them are built
+                self.prune_fragments()
+        finally:
+            self.items.close()
+            if self.renderer is not None:
+                self.renderer.shutdown(cancel_futures=True)
+            if self.temporary_cache:
+                shutil.rmtree(self.fragment_cache.directory, ignore_errors=True)
+
+    def prune_fragments(self):
+        keep = set()
+        for pipeline in self.instances():
+            keep |= pipeline.used_fragments
+        deleted = self.fragment_cache.prune(keep)
+        if deleted:
+            logger.info("Pruned %d unused fragments from %s", deleted, self.fragment_cache.directory)
+            self.inc_stat('pdf/fragments_pruned', deleted)
+
+    def write_output(self):
+        output = self.output
+        if self.title is None:
+            self.title = "Course Content"
+        incremental = bool(self.fragment_cache or self.render_workers > 1)
+        # Hashes the content of every page, so the PDF is only kept when it
+        # was built from exactly these pages
+        build_key = fingerprint(incremental, self.include_bonus, self.title,
+                                [[key[2], self.fragment_key(item)] for key, item in self.items])
+        if self.last_build_key(output) == build_key:
+            logger.info("No page changed since %s was built, keeping it", output)
+            self.inc_stat('pipeline/build_skipped')
+        else:
+            if os.path.dirname(output):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+            started = time.perf_counter()
+            if incremental:
+                self.build_incremental(output)
+            else:
+                self.build(output)
+            self.inc_stat('pdf/build_seconds', time.perf_counter() - started)
+            with open(f"{output}.build", 'w', encoding='utf-8') as f:
+                f.write(build_key)
+        self.items.close()
+
+    def last_build_key(self, output):
+        """Key of the pages the existing output was built from, if any"""
+        try:
+            with open(f"{output}.build", encoding='utf-8') as f:
+                key = f.read()
+        except OSError:
+            return None
+        return key if os.path.exists(output) else None
+
+    def build(self, output):
+        with self.timer('render_styles_seconds'):
+            styles = self.create_styles()
+        self.outline = []
+        main_content = []
+
+        # Process content in unit order, streaming items back from the buffer
+        with self.timer('render_flowables_seconds'):
+            for unit, unit_items in self.iter_units():
+                # Add unit header
+                main_content.extend(self.create_unit_header(unit, styles))
+                
+                # Process items in order
+                for item in unit_items:
+                    self._process_content_item(item, styles, main_content)
+
+        # One pass: headings are bookmarked and their page number forms
+        # defined as they land, so the table of contents needs no relayout
+        content = self.create_title_page(styles) + self.create_toc(styles) + main_content
+        doc = self.create_document(output, outline=self.outline,
+                                   page_number_style=styles['TOCPageNumber'])
+        with self.timer('render_doc_build_seconds'):
+            doc.build(
+                content,
+                onFirstPage=self.create_header_footer,
+                onLaterPages=self.create_header_footer
+            )
+        self.inc_stat('pdf/pages', doc.page)
+
+    def build_incremental(self, output):
+        """Assemble the PDF from per-page fragments.
+
+        Only unit headers and items whose content hash is not in the
+        fragment cache are laid out, on a process pool when render_workers
+        is above one. Without a configured cache the fragments only live for
+        the duration of the build.
+        """
+        cache = self.fragment_cache
+        if cache is None:
+            cache = FragmentCache(tempfile.mkdtemp(prefix='webscraper-fragments-'))
+        try:
+            with self.timer('render_fragments_seconds'):
+                fragments = self._render_fragments(cache)
+            with self.timer('render_assemble_seconds'):
+                self._assemble(fragments, output)
+        finally:
+            if cache is not self.fragment_cache:
+                shutil.rmtree(cache.directory, ignore_errors=True)
+
+    def _render_fragments(self, cache):
+        """Return the fragment of every unit header and item, in course order"""
+        keys = []
+        fragments = {}
+        jobs = defaultdict(list)  # Cache misses still to render, per unit
+
+        # Fragments laid out in the background while the crawl ran
+        for future in self.prerendered.values():
+            future.result()
+
+        for unit, unit_items in self.iter_units():
+            planned = [(fingerprint('unit', unit), ('unit', unit))]
+            planned.extend(
+                (self.fragment_key(item), ('item', item))
+                for item in unit_items
+            )
+            for key, job in planned:
+                keys.append(key)
+                fragment = cache.get(key)
+                if fragment is None:
+                    jobs[unit].append((key, job))
+                else:
+                    fragments[key] = dict(fragment, rendered=key in self.prerendered)
+
+        if self.render_workers > 1 and len(jobs) > 1:
+            # ReportLab layout is CPU-bound pure Python, so units are laid out
+            # in separate processes rather than threads
+            with ProcessPoolExecutor(max_workers=self.render_workers,
+                                     mp_context=get_context('spawn')) as pool:
+                futures = [pool.submit(render_fragments, unit_jobs, cache.directory,
+                                       self.code_highlight)
+                           for unit_jobs in jobs.values()]
+                for future in futures:
+                    for fragment in future.result():
+                        fragments[fragment['key']] = fragment
+        else:
+            styles = self.create_styles()
+            for unit_jobs in jobs.values():
+                for fragment in self.render_jobs(unit_jobs, cache, styles):
+                    fragments[fragment['key']] = fragment
+
+        self.used_fragments = set(keys)
+        return [fragments[key] for key in keys]
+
+    def render_jobs(self, jobs, cache, styles):
+        """Lay out (key, job) pairs and store them in the fragment cache"""
+        for key, (kind, payload) in jobs:
+            # Building the flowables records their headings in self.outline,
+            # which is kept per fragment here
+            self.outline = []
+            if kind == 'unit':
+                flowables = self.create_unit_header(payload, styles)
+            else:
+                flowables = self._item_flowables(payload, styles)
+
+            pdf_bytes, page_count, outline_pages = self.render_fragment(flowables)
+            fragment = cache.put(key, pdf_bytes, {
+                'key': key,
+                'pages': page_count,
+                'outline': self.outline,
+                'outline_pages': outline_pages
+            })
+            yield dict(fragment, rendered=True)
+
+    def _assemble(self, fragments, output):
+        styles = self.create_styles()
+
+        # Global outline with page indexes relative to the start of the body
+        self.outline = []
+        body_pages = []
+        offset = 0
+        for fragment in fragments:
+            for (title, level), page in zip(fragment['outline'], fragment['outline_pages']):
+                self.outline.append((title, level))
+                body_pages.append(offset + page - 1)
+            offset += fragment['pages']
+
+        # The front matter length shifts every page number listed in its TOC,
+        # so re-render the (small) front matter until its length is stable
+        front_pages = 2
+        while True:
+            pages = [front_pages + page + 1 for page in body_pages]
+            links = []
+            front_matter = self.create_title_page(styles) + self.create_toc(styles, pages, links)
+            front_pdf, page_count, _ = self.render_fragment(front_matter)
+            if page_count == front_pages:
+                break
+            front_pages = page_count
+
+        page_count = assemble_pdf(
+            [io.BytesIO(front_pdf)] + [fragment['path'] for fragment in fragments],
+            output,
+            self.create_document(output),
+            self.create_header_footer,
+            bookmarks=[(title, level, page - 1)
+                       for (title, level), page in zip(self.outline, pages)],
+            links=links
+        )
+        rendered = sum(fragment['rendered'] for fragment in fragments)
+        self.inc_stat('pdf/pages', page_count)
+        self.inc_stat('pdf/fragments_rendered', rendered)
+        logger.info("Assembled %s (%d pages): %d of %d fragments re-rendered",
+                    output, page_count, rendered, len(fragments))
+
+    def render_fragment(self, flowables):
+        """Lay out flowables as a standalone PDF without page furniture.
+
+        Returns the PDF bytes, its page count and the page of every outline
+        heading among the flowables, in outline order.
+        """
+        buffer = io.BytesIO()
+        doc = self.create_document(buffer)
+        doc.build(flowables)
+
+        # A heading that was never drawn falls back to the page of the one
+        # before it
+        outline_pages = []
+        for index in range(len(self.outline)):
+            outline_pages.append(doc.outline_pages.get(
+                index, outline_pages[-1] if outline_pages else 1
+            ))
+        return buffer.getvalue(), doc.page, outline_pages
+
+    def _item_flowables(self, item, styles):
+        flowables = []
+        self._process_content_item(item, styles, flowables)
+        return flowables
+
+    def _process_content_item(self, item, styles, main_content):
+        if item['title']:
+            main_content.append(Paragraph(item['title'], styles['Heading1']))
+        
+        main_content.append(
+            Paragraph(f"Source: {item['url']}", styles['SourceURL'])
+        )
+        main_content.append(Spacer(1, 0.2 * inch))
+        
+        for block in item['content_blocks']:
+            element = self.process_content_block(block, styles)
+            if not element:
+                continue
+            # Code blocks come as a list of page-sized chunks
+            if isinstance(element, list):
+                main_content.extend(element)
+            else:
+                main_content.append(element)
+            if block['type'] in ['heading', 'code']:
+                main_content.append(Spacer(1, 0.1 * inch))
+        
+        main_content.append(PageBreak())
+
+
+def render_fragments(jobs, cache_dir, code_highlight=False):
+    """Process pool entry point: render fragment jobs into the cache"""
+    pipeline = WebscraperPipeline(fragment_cache_dir=cache_dir, code_highlight=code_highlight)
+    return list(pipeline.render_jobs(jobs, pipeline.fragment_cache, pipeline.create_styles()))
@@ -5,280 +5,480 @@
 
 
 # useful for handling different item types with a single interface
+from abc import ABC, abstractmethod
 from itemadapter import ItemAdapter
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, PageBreak, Preformatted,
-    ListFlowable, ListItem
-)
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
-from collections import defaultdict
-
-class WebscraperPipeline:
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+import json
+import logging
+import os
+from .chunking import ChunkState, block_markdown, chunk_item
+from .course import course_path
+from .dedup import DuplicateDetector
+from .items import Block
+from .search import SearchIndex
+from .urls import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class CourseRouting(ABC):
+    """Give every course of a multi-course crawl its own pipeline instance.
+
+    When the spider crawls more than one course, ``open_courses`` makes an
+    instance per course with ``for_course`` and ``route`` hands each item to
+    the instance of its course, so every course gets its own outputs. A
+    single-course crawl is handled by the pipeline itself. Stats counted by
+    an instance are also recorded per course, as ``<stat>/<course>``.
+    """
+
     def __init__(self):
-        self.items = defaultdict(list)
-        self.outline = []
-        
-        # Unit 0 and 1 page order
-        self.page_order = {
-            # Unit 0 pages
-            'introduction': 1,
-            'onboarding': 2,
-            'discord101': 3,
-            
-            # Unit 1 pages
-            'what-are-agents': 1,
-            'what-are-llms': 2,
-            'messages-and-special-tokens': 3,
-            'tools': 4,
-            'agent-steps-and-structure': 5,
-            'thoughts': 6,
-            'actions': 7,
-            'observations': 8,
-            'dummy-agent-library': 9,
-            'tutorial': 10,
-            'quiz1': 11,
-            'quiz2': 12,
-            'final-quiz': 13,
-            'conclusion': 14
-        }
+        self.course = None  # Set on the instance of a course
+        self.routes = {}  # Course name -> instance
+
+    def open_courses(self, spider):
+        names = list(getattr(spider, 'courses', None) or ())
+        self.routes = {name: self.for_course(name) for name in names} if len(names) > 1 else {}
+        for name, pipeline in self.routes.items():
+            pipeline.course = name
+            pipeline.stats = self.stats
+
+    @abstractmethod
+    def for_course(self, name):
+        """New instance of the pipeline for course name, writing its own outputs"""
+
+    def route(self, item):
+        if not self.routes:
+            return self
+        # Items from before the crawl had several courses go to the first one
+        return self.routes.get(item.get('course')) or next(iter(self.routes.values()))
+
+    def instances(self):
+        return list(self.routes.values()) or [self]
+
+    def inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+            if self.course:
+                self.stats.inc_value(f'{key}/{self.course}', count)
+
+
+class DedupPipeline:
+    """Collapse near-duplicate pages and content blocks across the course.
+
+    Repeated boilerplate (quiz instructions, community call-outs, the same
+    snippet in several units) is found with MinHash/LSH. The original is
+    the copy earliest in course order, so eager and sequential crawls agree
+    on it. In ``collapse`` mode later copies are removed: duplicate blocks
+    are dropped and duplicate pages are dropped as items. In ``reference``
+    mode they are replaced by a ``reference`` block pointing at the page
+    holding the original. A copy that arrives before the original can no
+    longer be changed and is kept as it is. Runs before the export,
+    chunking and PDF stages so none of them repeat the work. Each course is
+    deduplicated on its own.
+    """
+
+    MODES = ('collapse', 'reference')
+
+    def __init__(self, mode='reference', threshold=0.85, min_words=8):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown DEDUP_MODE: {mode!r}")
+        self.mode = mode
+        self.threshold = threshold
+        self.min_words = min_words
+        self.detectors = {}  # Course name -> DuplicateDetector
+        self.stats = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('DEDUP_MODE'):
+            raise NotConfigured('DEDUP_MODE is not set')
+        pipeline = cls(
+            settings.get('DEDUP_MODE'),
+            threshold=settings.getfloat('DEDUP_THRESHOLD', 0.85),
+            min_words=settings.getint('DEDUP_MIN_WORDS', 8)
+        )
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def open_spider(self, spider):
+        # Pages restored from a checkpoint remain the originals of anything
+        # they repeat
+        checkpoint = getattr(spider, 'checkpoint', None)
+        if checkpoint:
+            for _, item in checkpoint.items():
+                detector = self.detector(item)
+                detector.check_page(item)
+                for block in item.get('content_blocks') or ():
+                    detector.check_block(block, item)
+
+    def detector(self, item):
+        course = item.get('course')
+        if course not in self.detectors:
+            self.detectors[course] = DuplicateDetector(threshold=self.threshold,
+                                                       min_words=self.min_words)
+        return self.detectors[course]
+
+    def inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
 
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
-        unit = adapter.get('unit', '')
-        if unit:
-            # Extract page name from URL
-            page_name = item['url'].rstrip('/').split('/')[-1]
-            # Get predefined order or use a high number for unknown pages
-            order = self.page_order.get(page_name, 999)
-            item['unit_order'] = order
-            self.items[unit].append(item)
-        else:
-            depth = adapter.get('depth', 0)
-            self.items[f"depth_{depth}"].append(item)
+        detector = self.detector(adapter)
+        original = detector.check_page(adapter)
+        if original is not None:
+            self.inc_stat('dedup/pages')
+            if self.mode == 'collapse':
+                raise DropItem(f"Near-duplicate of {original[0]}")
+            adapter['content_blocks'] = [self.reference('page', original)]
+            return item
+
+        blocks = []
+        for block in adapter.get('content_blocks') or ():
+            original = detector.check_block(block, adapter)
+            if original is None:
+                blocks.append(block)
+                continue
+            self.inc_stat('dedup/blocks')
+            if self.mode == 'reference':
+                blocks.append(self.reference(block['type'], original))
+        adapter['content_blocks'] = blocks
         return item
-    
-    def create_styles(self):
-        styles = getSampleStyleSheet()
-        
-        # Modify existing heading style
-        styles['Heading1'].fontSize = 24
-        styles['Heading1'].spaceAfter = 22
-        styles['Heading1'].spaceBefore = 22
-        styles['Heading1'].alignment = TA_LEFT
-        
-        # Table of Contents style
-        styles.add(
-            ParagraphStyle(
-                name='TOCEntry',
-                parent=styles['Normal'],
-                fontSize=12,
-                leading=16,
-                spaceBefore=6,
-                spaceAfter=6,
-            )
-        )
-        
-        # Code block style with better formatting
-        styles.add(
-            ParagraphStyle(
-                name='CodeBlock',
-                fontName='Courier',
-                fontSize=9,
-                leading=12,
-                textColor=colors.black,
-                backColor=colors.lightgrey,
-                leftIndent=20,
-                rightIndent=20,
-                spaceBefore=10,
-                spaceAfter=10,
-                firstLineIndent=0,
-                borderWidth=1,
-                borderColor=colors.grey,
-                borderPadding=5
-            )
-        )
-        
-        # URL style
-        styles.add(
-            ParagraphStyle(
-                name='SourceURL',
-                parent=styles['Italic'],
-                textColor=colors.blue,
-                fontSize=10,
-                spaceBefore=5,
-                spaceAfter=20
-            )
-        )
-        
-        # List style with better indentation
-        styles.add(
-            ParagraphStyle(
-                name='BulletPoint',
-                parent=styles['Normal'],
-                leftIndent=20,
-                spaceBefore=5,
-                spaceAfter=5,
-                bulletIndent=10,
-                firstLineIndent=0
-            )
+
+    def reference(self, kind, original):
+        url, title = original
+        return Block(
+            type='reference',
+            content=f"Same {kind} as in {title or url}",
+            parent=url
         )
-        
-        # Add custom heading styles for levels 2-6
-        for i in range(2, 7):
-            styles.add(
-                ParagraphStyle(
-                    name=f'CustomHeading{i}',
-                    parent=styles['Heading1'],
-                    fontSize=24-(i*2),
-                    spaceAfter=22-(i*2),
-                    spaceBefore=22-(i*2),
-                    leftIndent=(i-1)*10  # Increase indentation for sub-headings
-                )
-            )
-        
-        return styles
-    
-    def process_content_block(self, block, styles):
-        if block['type'] == 'heading':
-            style_name = 'Heading1' if block['level'] == 1 else f'CustomHeading{block["level"]}'
-            heading = Paragraph(
-                block['content'],
-                styles[style_name]
-            )
-            self.outline.append((block['content'], block['level']))
-            return heading
-            
-        elif block['type'] == 'paragraph':
-            return Paragraph(
-                block['content'],
-                styles['Normal']
-            )
-            
-        elif block['type'] == 'code':
-            # Add line numbers to code blocks
-            lines = block['content'].split('\n')
-            numbered_lines = [f'{i+1:<3} {line}' for i, line in enumerate(lines)]
-            return Preformatted(
-                '\n'.join(numbered_lines),
-                styles['CodeBlock']
-            )
-            
-        elif block['type'] == 'list':
-            items = []
-            for item_text in block['items']:
-                items.append(
-                    ListItem(
-                        Paragraph(item_text, styles['BulletPoint']),
-                        value='bullet'
-                    )
-                )
-            return ListFlowable(
-                items,
-                bulletType='bullet',
-                start='bullet',
-                leftIndent=20,
-                bulletFontSize=8,
-                bulletOffsetY=2
-            )
-            
-        return None
-
-    def create_header_footer(self, canvas, doc):
-        canvas.saveState()
-        canvas.setFont('Times-Roman', 9)
-        
-        # Footer with page number
-        canvas.drawString(doc.leftMargin, 0.75 * inch, "Hugging Face Agents Course")
-        page_num = canvas.getPageNumber()
-        canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, 0.75 * inch,
-                             f"Page {page_num}")
-        
-        canvas.restoreState()
-    
-    def create_toc(self, styles):
-        content = [Paragraph("Table of Contents", styles['Heading1'])]
-        
-        for title, level in self.outline:
-            indent = (level - 1) * 20
-            content.append(
-                Paragraph(
-                    f"{'&nbsp;' * indent}{title}",
-                    styles['TOCEntry']
-                )
-            )
-        
-        content.append(PageBreak())
-        return content
-    
+
+
+class CheckpointPipeline:
+    """Store every item in the spider's checkpoint and mark its page visited.
+
+    Both happen in one transaction, so a resumed crawl neither parses the
+    page again nor loses its item, whichever other pipelines are enabled.
+    Runs right after deduplication, so restored items are the deduplicated
+    ones; pages whose item is dropped are only marked visited. Does nothing
+    when the crawl has no checkpoint.
+    """
+
+    def __init__(self):
+        self.checkpoint = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls()
+        crawler.signals.connect(pipeline.item_dropped, signal=signals.item_dropped)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.checkpoint = getattr(spider, 'checkpoint', None)
+
+    def process_item(self, item, spider):
+        if self.checkpoint:
+            adapter = ItemAdapter(item)
+            url = canonicalize_url(adapter['url'])
+            self.checkpoint.add_item(url, [adapter.get('global_order')], adapter.asdict())
+            self.checkpoint.mark_visited(url)
+            self.checkpoint.commit()
+        return item
+
+    def item_dropped(self, item, response, exception, spider):
+        if self.checkpoint:
+            self.checkpoint.mark_visited(canonicalize_url(ItemAdapter(item)['url']))
+            self.checkpoint.commit()
+
+
+class StreamingExportPipeline(CourseRouting):
+    """Export every item to JSONL and a per-page Markdown file as it arrives.
+
+    Writes are buffered and only flushed and fsynced every ``fsync_every``
+    items and at close, so other tools can follow ``items.jsonl`` while the
+    crawl runs. The JSONL is the durable record; Markdown pages are derived
+    from it and written without fsync. On a resumed crawl the JSONL is
+    appended to, after dropping a line torn by the interruption and adding
+    any checkpointed items it is missing. A multi-course crawl exports each
+    course to its own ``<directory>/<course>``.
+    """
+
+    def __init__(self, directory='export', fsync_every=50):
+        super().__init__()
+        self.directory = directory
+        self.jsonl_path = os.path.join(directory, 'items.jsonl')
+        self.pages_dir = os.path.join(directory, 'pages')
+        self.fsync_every = fsync_every
+        self.file = None
+        self.stats = None
+        self.exported = set()
+        self.pending = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        directory = crawler.settings.get('EXPORT_DIR')
+        if not directory:
+            raise NotConfigured('EXPORT_DIR is not set')
+        pipeline = cls(directory, crawler.settings.getint('EXPORT_FSYNC_EVERY', 50))
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def for_course(self, name):
+        return type(self)(os.path.join(self.directory, name), self.fsync_every)
+
+    def open_spider(self, spider):
+        self.open_courses(spider)
+        checkpoint = getattr(spider, 'checkpoint', None)
+        for pipeline in self.instances():
+            pipeline.open(resume=checkpoint is not None)
+        if checkpoint:
+            for _, item in checkpoint.items():
+                pipeline = self.route(item)
+                if canonicalize_url(item['url']) not in pipeline.exported:
+                    pipeline.export(item)
+            for pipeline in self.instances():
+                pipeline.sync()
+
+    def open(self, resume=False):
+        os.makedirs(self.pages_dir, exist_ok=True)
+        self.exported = self.recover() if resume else set()
+        self.file = open(self.jsonl_path, 'a' if resume else 'w',
+                         encoding='utf-8', buffering=1 << 16)
+
+    def recover(self):
+        """Truncate the JSONL after its last complete line and return its URLs"""
+        urls = set()
+        try:
+            f = open(self.jsonl_path, 'r+b')
+        except FileNotFoundError:
+            return urls
+        with f:
+            valid = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    urls.add(canonicalize_url(json.loads(line)['url']))
+                except (ValueError, KeyError):
+                    break
+                valid += len(line)
+            f.truncate(valid)
+        return urls
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        pipeline = self.route(adapter)
+        # Already exported before the crawl was interrupted
+        if canonicalize_url(adapter['url']) not in pipeline.exported:
+            pipeline.export(item)
+        return item
+
+    def export(self, item):
+        data = ItemAdapter(item).asdict()
+        self.file.write(json.dumps(data, ensure_ascii=False) + '\n')
+        self.write_page(data)
+        self.exported.add(canonicalize_url(data['url']))
+        self.inc_stat('export/items')
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def page_path(self, item):
+        unit = item.get('unit') or f"depth_{item.get('depth', 0)}"
+        name = item['url'].rstrip('/').rsplit('/', 1)[-1] or 'index'
+        order = item.get('global_order')
+        if isinstance(order, int):
+            name = f"{order:03d}-{name}"
+        return os.path.join(self.pages_dir, unit, f"{name}.md")
+
+    def write_page(self, item):
+        path = self.page_path(item)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(to_markdown(item))
+
     def close_spider(self, spider):
-        doc = SimpleDocTemplate(
-            "course_content.pdf",
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        styles = self.create_styles()
-        content = []
-        
-        # Add title page
-        content.append(Paragraph("Hugging Face Agents Course", styles['Heading1']))
-        content.append(Spacer(1, 30))
-        content.append(PageBreak())
-        
-        main_content = []
-
-        # Process content in unit order
-        unit_keys = sorted([k for k in self.items.keys() if k.startswith('unit')], 
-                         key=lambda x: int(x.replace('unit', '')))
-        
-        for unit in unit_keys:
-            # Sort items within unit by their page_order
-            unit_items = sorted(self.items[unit], 
-                             key=lambda x: x.get('unit_order', float('inf')))
-            
-            # Add unit header
-            main_content.append(Paragraph(f"Unit {unit.replace('unit', '')}", 
-                                       styles['Heading1']))
-            main_content.append(PageBreak())
-            
-            # Process items in order
-            for item in unit_items:
-                self._process_content_item(item, styles, main_content)
-
-        # Add table of contents
-        content.extend(self.create_toc(styles))
-        
-        # Add main content
-        content.extend(main_content)
-        
-        # Build PDF
-        doc.build(
-            content,
-            onFirstPage=self.create_header_footer,
-            onLaterPages=self.create_header_footer
-        )
+        for pipeline in self.instances():
+            pipeline.sync()
+            pipeline.file.close()
+
+
+class ChunkingPipeline(CourseRouting):
+    """Split items into overlapping, heading-bounded chunks for embedding.
 
-    def _process_content_item(self, item, styles, main_content):
-        if item['title']:
-            main_content.append(Paragraph(item['title'], styles['Heading1']))
-        
-        main_content.append(
-            Paragraph(f"Source: {item['url']}", styles['SourceURL'])
+    Only chunks whose hash was not emitted for the page on an earlier run
+    are written to ``output``; chunks that disappeared from a page are
+    written as ``{"url": ..., "hash": ..., "deleted": true}`` records, so an
+    embedding index can be kept in sync with the course. Emitted hashes
+    live in a SQLite state file, committed only after the output is synced.
+    A multi-course crawl keeps an output and state file per course.
+    """
+
+    def __init__(self, output, state_path, max_tokens=512, overlap_tokens=64, sync_every=50):
+        super().__init__()
+        self.output = output
+        self.state_path = state_path
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.sync_every = sync_every
+        self.state = None
+        self.file = None
+        self.stats = None
+        self.pending = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('CHUNKS_OUTPUT'):
+            raise NotConfigured('CHUNKS_OUTPUT is not set')
+        pipeline = cls(
+            settings.get('CHUNKS_OUTPUT'),
+            settings.get('CHUNKS_STATE_FILE'),
+            max_tokens=settings.getint('CHUNK_MAX_TOKENS', 512),
+            overlap_tokens=settings.getint('CHUNK_OVERLAP_TOKENS', 64),
+            sync_every=settings.getint('EXPORT_FSYNC_EVERY', 50)
         )
-        main_content.append(Spacer(1, 0.2 * inch))
-        
-        for block in item['content_blocks']:
-            element = self.process_content_block(block, styles)
-            if element:
-                main_content.append(element)
-                if block['type'] in ['heading', 'code']:
-                    main_content.append(Spacer(1, 0.1 * inch))
-        
-        main_content.append(PageBreak())
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def for_course(self, name):
+        return type(self)(course_path(self.output, name), course_path(self.state_path, name),
+                          self.max_tokens, self.overlap_tokens, self.sync_every)
+
+    def open_spider(self, spider):
+        self.open_courses(spider)
+        # A resumed crawl adds to the chunks its interrupted run emitted
+        resuming = getattr(spider, 'checkpoint', None) is not None
+        for pipeline in self.instances():
+            pipeline.open(resuming)
+
+    def open(self, resume=False):
+        for path in (self.output, self.state_path):
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.state = ChunkState(self.state_path, {
+            'max_tokens': self.max_tokens,
+            'overlap_tokens': self.overlap_tokens,
+        })
+        self.file = open(self.output, 'a' if resume else 'w',
+                         encoding='utf-8', buffering=1 << 16)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        self.route(adapter).add(adapter)
+        return item
+
+    def add(self, adapter):
+        previous = self.state.hashes(adapter['url'])
+        if adapter.get('unchanged') and previous:
+            return
+
+        chunks = chunk_item(adapter, self.max_tokens, self.overlap_tokens)
+        hashes = {chunk['hash'] for chunk in chunks}
+        for chunk in chunks:
+            if chunk['hash'] not in previous:
+                self.file.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+                self.inc_stat('chunks/emitted')
+        for hash in sorted(previous - hashes):
+            self.file.write(json.dumps({'url': adapter['url'], 'hash': hash, 'deleted': True}) + '\n')
+            self.inc_stat('chunks/deleted')
+        self.state.replace(adapter['url'], hashes)
+
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.state.commit()
+        self.pending = 0
+
+    def close_spider(self, spider):
+        for pipeline in self.instances():
+            pipeline.sync()
+            pipeline.file.close()
+            pipeline.state.close()
+
+
+class SearchIndexPipeline:
+    """Load content blocks into the SQLite FTS5 index as items arrive.
+
+    Pages whose content hash is unchanged are skipped; the others have their
+    rows rewritten. Inserts are committed in batches of ``batch_size``
+    items and at close.
+    """
+
+    def __init__(self, path, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.index = None
+        self.stats = None
+        self.pending = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('SEARCH_INDEX_FILE')
+        if not path:
+            raise NotConfigured('SEARCH_INDEX_FILE is not set')
+        pipeline = cls(path, crawler.settings.getint('SEARCH_BATCH_SIZE', 100))
+        pipeline.stats = crawler.stats
+        return pipeline
+
+    def open_spider(self, spider):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.index = SearchIndex(self.path)
+
+    def process_item(self, item, spider):
+        if self.index.update(ItemAdapter(item)):
+            self.inc_stat('search/pages_indexed')
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.index.commit()
+                self.pending = 0
+        else:
+            self.inc_stat('search/pages_unchanged')
+        return item
+
+    def inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def close_spider(self, spider):
+        self.index.close()
+
+
+def to_markdown(item):
+    """Render an exported item and its content blocks as Markdown"""
+    lines = [f"# {item['title']}", '', f"Source: {item['url']}", '']
+    for block in item.get('content_blocks') or ():
+        text = block_markdown(block)
+        if text:
+            lines.extend([text, ''])
+    return '\n'.join(lines)
+
+
+def read_jsonl(path):
+    """Yield the items of a JSONL export, skipping a torn last line"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            yield json.loads(line)
+
+
+def __getattr__(name):
+    # The PDF pipeline lives in .pdf and is only imported when asked for, so
+    # that the other pipelines start without loading ReportLab and pypdf
+    if name in ('WebscraperPipeline', 'render_fragments'):
+        from . import pdf
+        return getattr(pdf, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,265 @@
+import hashlib
+import io
+import json
+import os
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.annotations import Link
+from reportlab.pdfbase.pdfmetrics import getAscent
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate
+
+# Bump whenever styles or block layout change so cached fragments are rebuilt
+FRAGMENT_VERSION = 4
+
+
+def fingerprint(*parts):
+    """Stable content hash of JSON-serializable parts"""
+    payload = json.dumps([FRAGMENT_VERSION, *parts], sort_keys=True,
+                         ensure_ascii=False, default=dict)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OutlineHeading(Paragraph):
+    """Heading paragraph for entry ``outline_index`` of the document outline.
+
+    When the heading is split across pages, its first part keeps the index,
+    so the page it starts on is still recorded.
+    """
+
+    def __init__(self, text, style, outline_index=None, **kwargs):
+        super().__init__(text, style, **kwargs)
+        self.outline_index = outline_index
+
+    def split(self, availWidth, availHeight):
+        parts = super().split(availWidth, availHeight)
+        if len(parts) > 1:
+            parts[0].outline_index = self.outline_index
+        return parts
+
+
+class OutlineEntry(Flowable):
+    """Table of contents row: a title paragraph with its page number beside the first line.
+
+    ``page`` is the page number, or None for the number of outline entry
+    ``index`` as OutlineDocTemplate defines it once its heading is drawn,
+    so the table of contents can come before the headings it lists. The
+    row links to ``target``: a destination name in the same document is
+    linked as the row is drawn, while a page index is recorded as
+    ``(page_index, rect, target)`` in ``links`` for documents assembled
+    later. Rows are never split, so each one is drawn exactly once.
+    """
+    # Space above and below the title, as in a table cell
+    padding = 3
+
+    def __init__(self, title, index, page, number_style, number_width, target, links=None):
+        super().__init__()
+        self.title = title
+        self.index = index
+        self.page = page
+        self.number_style = number_style
+        self.number_width = number_width
+        self.target = target
+        self.links = links
+
+    def wrap(self, availWidth, availHeight):
+        _, height = self.title.wrap(availWidth - self.number_width, availHeight)
+        self.width = availWidth
+        self.height = height + 2 * self.padding
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        return []
+
+    def draw(self):
+        self.title.drawOn(self.canv, 0, self.padding)
+        style = self.number_style
+        baseline = self.height - self.padding - getAscent(style.fontName, style.fontSize)
+        if self.page is not None:
+            self.canv.setFont(style.fontName, style.fontSize)
+            self.canv.drawRightString(self.width, baseline, str(self.page))
+        else:
+            self.canv.saveState()
+            self.canv.translate(self.width, baseline)
+            self.canv.doForm(OutlineDocTemplate.page_number_form(self.index))
+            self.canv.restoreState()
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        super().drawOn(canvas, x, y, _sW)
+        rect = (x, y, x + self.width, y + self.height)
+        if isinstance(self.target, str):
+            canvas.linkRect('', self.target, rect, relative=0)
+        else:
+            self.links.append((canvas.getPageNumber() - 1, rect, self.target))
+
+
+class OutlineDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that records the page each outline heading lands on.
+
+    Given the ``outline`` of ``(title, level)`` entries, it also adds a PDF
+    bookmark for every heading as it is drawn, and defines the page number
+    forms that OutlineEntry rows draw, styled as ``page_number_style``.
+    """
+
+    def __init__(self, *args, outline=None, page_number_style=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outline_pages = {}
+        self.outline = outline
+        self.page_number_style = page_number_style
+        self._outline_level = -1
+
+    @staticmethod
+    def destination(index):
+        return f'outline{index}'
+
+    @staticmethod
+    def page_number_form(index):
+        return f'outline-page{index}'
+
+    def afterFlowable(self, flowable):
+        index = getattr(flowable, 'outline_index', None)
+        if index is None or index in self.outline_pages:
+            return
+        self.outline_pages[index] = self.page
+        if self.outline is None:
+            return
+
+        title, level = self.outline[index]
+        # Outline levels may only go one deeper at a time
+        self._outline_level = min(level - 1, self._outline_level + 1)
+        self.canv.bookmarkPage(self.destination(index))
+        self.canv.addOutlineEntry(title, self.destination(index), self._outline_level)
+
+        style = self.page_number_style
+        if style is not None:
+            self.canv.beginForm(self.page_number_form(index), lowerx=-self.width,
+                                lowery=-style.leading, upperx=0, uppery=style.leading)
+            self.canv.setFont(style.fontName, style.fontSize)
+            self.canv.drawRightString(0, 0, str(self.page))
+            self.canv.endForm()
+
+
+class FragmentCache:
+    """On-disk cache of rendered PDF fragments keyed by content hash.
+
+    Each fragment is a standalone PDF without page furniture plus a small
+    JSON sidecar holding its page count and the outline entries it produced.
+    Every item in the course PDF starts on a fresh page, so fragments can be
+    concatenated without changing the layout.
+
+    With a ``max_size`` in bytes, ``prune`` deletes the least recently used
+    fragments until the cache fits; reading a fragment counts as a use.
+    """
+
+    def __init__(self, directory, max_size=0):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.pdf', base + '.json'
+
+    def get(self, key):
+        pdf_path, meta_path = self._paths(key)
+        if not (os.path.exists(pdf_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if self.max_size:
+            os.utime(meta_path)
+        meta['path'] = pdf_path
+        return meta
+
+    def put(self, key, pdf_bytes, meta):
+        pdf_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        # The sidecar is written last, so a partially written fragment is
+        # never mistaken for a cached one
+        self._write(pdf_path, pdf_bytes)
+        self._write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        return dict(meta, path=pdf_path)
+
+    def _write(self, path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def prune(self, keep=()):
+        """Delete least recently used fragments past max_size bytes.
+
+        Fragments whose key is in ``keep`` are never deleted. Returns the
+        number of fragments deleted.
+        """
+        if not self.max_size or not os.path.isdir(self.directory):
+            return 0
+        fragments = {}  # Key -> [size, last use, paths]
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                stat = entry.stat()
+                fragment = fragments.setdefault(entry.name.split('.', 1)[0], [0, 0, []])
+                fragment[0] += stat.st_size
+                fragment[1] = max(fragment[1], stat.st_mtime)
+                if entry.name.endswith('.json'):
+                    # Deleted first, so a half deleted fragment is a miss
+                    fragment[2].insert(0, entry.path)
+                else:
+                    fragment[2].append(entry.path)
+
+        total = sum(size for size, _, _ in fragments.values())
+        deleted = 0
+        for key, (size, _, paths) in sorted(fragments.items(), key=lambda pair: pair[1][1]):
+            if total <= self.max_size:
+                break
+            if key in keep:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            deleted += 1
+        return deleted
+
+
+def assemble_pdf(fragments, output, doc, on_page, bookmarks=(), links=()):
+    """Concatenate fragment PDFs into output and stamp page furniture.
+
+    ``fragments`` is a list of PDF paths or file-like objects. ``on_page`` is
+    the usual ReportLab ``(canvas, doc)`` page callback; it is drawn on an
+    overlay with the final, global page numbers and merged onto every page.
+    ``bookmarks`` are ``(title, level, page_index)`` entries added as nested
+    PDF outline items, and ``links`` ``(page_index, rect, target_page_index)``
+    entries become clickable areas jumping to their target page.
+    """
+    writer = PdfWriter()
+    for fragment in fragments:
+        writer.append(fragment)
+
+    parents = []  # Stack of (level, outline item) for nesting
+    for title, level, page_index in bookmarks:
+        while parents and parents[-1][0] >= level:
+            parents.pop()
+        parent = parents[-1][1] if parents else None
+        parents.append((level, writer.add_outline_item(title, page_index, parent=parent)))
+    for page_index, rect, target in links:
+        writer.add_annotation(page_index, Link(rect=rect, target_page_index=target))
+
+    overlay_buffer = io.BytesIO()
+    overlay = Canvas(overlay_buffer, pagesize=doc.pagesize)
+    for _ in writer.pages:
+        on_page(overlay, doc)
+        overlay.showPage()
+    overlay.save()
+
+    overlay_pages = PdfReader(overlay_buffer).pages
+    for page, overlay_page in zip(writer.pages, overlay_pages):
+        # Drawn underneath the content, as ReportLab does for onPage callbacks
+        page.merge_page(overlay_page, over=False)
+
+    with open(output, 'wb') as f:
+        writer.write(f)
+    return len(writer.pages)
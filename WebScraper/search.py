@@ -0,0 +1,153 @@
+"""Full-text search over scraped course content.
+
+    python -m WebScraper.search "tool calling" [--db export/search.sqlite3] [-n 10]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from .urls import canonicalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    unit TEXT,
+    title TEXT,
+    heading_path TEXT,
+    type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_url ON blocks (url);
+CREATE VIRTUAL TABLE IF NOT EXISTS blocks_fts USING fts5(
+    content, heading_path, title,
+    content='blocks', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS blocks_insert AFTER INSERT ON blocks BEGIN
+    INSERT INTO blocks_fts (rowid, content, heading_path, title)
+    VALUES (new.id, new.content, new.heading_path, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS blocks_delete AFTER DELETE ON blocks BEGIN
+    INSERT INTO blocks_fts (blocks_fts, rowid, content, heading_path, title)
+    VALUES ('delete', old.id, old.content, old.heading_path, old.title);
+END;
+"""
+
+# bm25 column weights for content, heading_path and title
+WEIGHTS = (1.0, 2.0, 3.0)
+
+
+def block_text(block):
+    if block['type'] == 'list':
+        return '\n'.join(block.get('items') or ())
+    return block.get('content') or ''
+
+
+class SearchIndex:
+    """SQLite FTS5 index of content blocks, tagged with their page and headings.
+
+    Pages are keyed by canonical URL with a hash of their content, so
+    re-indexing an unchanged page is a single lookup and a changed page has
+    only its own rows rewritten. Writes are left in an open transaction
+    until ``commit``, so callers decide the batch size.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def update(self, item):
+        """Index an item's blocks; returns False when the page is unchanged"""
+        url = canonicalize_url(item['url'])
+        blocks = item.get('content_blocks') or ()
+        content_hash = hashlib.sha256(json.dumps(
+            [item.get('title'), item.get('unit'), blocks], sort_keys=True,
+            ensure_ascii=False, default=dict
+        ).encode('utf-8')).hexdigest()
+        row = self.db.execute('SELECT hash FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is not None and row[0] == content_hash:
+            return False
+
+        rows = []
+        path = []  # (level, title) of the headings above the current block
+        for position, block in enumerate(blocks):
+            if block['type'] == 'heading':
+                level = block.get('level') or 1
+                while path and path[-1][0] >= level:
+                    path.pop()
+                path.append((level, block['content']))
+            text = block_text(block)
+            if text:
+                rows.append((url, item.get('unit'), item.get('title'),
+                             ' > '.join(title for _, title in path),
+                             block['type'], position, text))
+
+        self.db.execute('DELETE FROM blocks WHERE url = ?', (url,))
+        self.db.executemany(
+            'INSERT INTO blocks (url, unit, title, heading_path, type, position, content) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        self.db.execute('INSERT OR REPLACE INTO pages (url, hash) VALUES (?, ?)',
+                        (url, content_hash))
+        return True
+
+    def search(self, query, limit=10, raw=False):
+        """Best matching blocks as dicts with a highlighted snippet.
+
+        Unless ``raw`` is set, every word of the query is quoted so that
+        punctuation is not read as FTS5 query syntax.
+        """
+        if not raw:
+            query = ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+        cursor = self.db.execute(
+            'SELECT b.url, b.title, b.unit, b.heading_path, b.type, '
+            "snippet(blocks_fts, 0, '[', ']', '...', 16), bm25(blocks_fts, ?, ?, ?) AS score "
+            'FROM blocks_fts JOIN blocks b ON b.id = blocks_fts.rowid '
+            'WHERE blocks_fts MATCH ? ORDER BY score LIMIT ?',
+            (*WEIGHTS, query, limit)
+        )
+        columns = ('url', 'title', 'unit', 'heading_path', 'type', 'snippet', 'score')
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the scraped course content")
+    parser.add_argument('query')
+    parser.add_argument('--db', default='export/search.sqlite3')
+    parser.add_argument('-n', '--limit', type=int, default=10)
+    parser.add_argument('--raw', action='store_true', help="pass the query to FTS5 as is")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"no search index at {args.db}")
+
+    index = SearchIndex(args.db)
+    started = time.perf_counter()
+    results = index.search(args.query, args.limit, raw=args.raw)
+    elapsed = time.perf_counter() - started
+    for result in results:
+        location = ' > '.join(part for part in (result['title'], result['heading_path']) if part)
+        print(f"{result['url']}\n  {location} ({result['type']})\n  {result['snippet']}\n")
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
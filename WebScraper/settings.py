@@ -18,10 +18,125 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 8
 # Configure a delay for requests (in seconds)
 DOWNLOAD_DELAY = 1
 
+# Persist visited URLs, pending requests and collected items to this SQLite
+# file so an interrupted crawl resumes where it stopped (also available as
+# -a checkpoint=<path>). Delete the file to start from scratch.
+#CHECKPOINT_FILE = "crawl_checkpoint.sqlite"
+
+# The course structure (units and sections in order) is discovered from the
+# site's navigation, or its sitemap.xml, and cached as a JSON manifest per
+# course in this directory. Manifests older than COURSE_MANIFEST_MAX_AGE
+# seconds are rediscovered (0 keeps them until -a refresh=1).
+COURSE_MANIFEST_DIR = "manifests"
+COURSE_MANIFEST_MAX_AGE = 7 * 24 * 3600
+
+# Several courses can share one crawl (-a course=<root>,<root>,...), along
+# with its connection pool and per-domain concurrency limits. Each course
+# is then written to its own outputs, named after the course's last URL
+# segment: <EXPORT_DIR>/<course>/, export/<course>/chunks.jsonl and
+# <course>/course_content.pdf. The search index stays shared.
+
+# Requested URLs are tracked exactly up to this many entries, then in a
+# scalable Bloom filter
+SEEN_URLS_EXACT_LIMIT = 100000
+
 # Configure item pipelines
+# The export pipeline streams items to JSONL and Markdown under EXPORT_DIR
+# during the crawl. The PDF pipeline is optional: drop it here and build the
+# PDF later from the export with "python -m WebScraper.buildpdf". ReportLab
+# and pypdf are only imported when it is enabled. The checkpoint pipeline
+# records items and visited pages when the crawl has a checkpoint file.
 ITEM_PIPELINES = {
-   "WebScraper.pipelines.WebscraperPipeline": 300,
+   "WebScraper.pipelines.DedupPipeline": 100,
+   "WebScraper.pipelines.CheckpointPipeline": 150,
+   "WebScraper.pipelines.StreamingExportPipeline": 200,
+   "WebScraper.pipelines.ChunkingPipeline": 250,
+   "WebScraper.pipelines.SearchIndexPipeline": 260,
+   "WebScraper.pdf.WebscraperPipeline": 300,
+}
+# Near-duplicate pages and blocks (similarity >= DEDUP_THRESHOLD, blocks of
+# at least DEDUP_MIN_WORDS words) are dropped ("collapse") or replaced by a
+# link to their earliest occurrence in the course ("reference"). Off unless
+# set; a copy crawled before its earlier occurrence is still kept whole.
+#DEDUP_MODE = "reference"
+DEDUP_THRESHOLD = 0.85
+DEDUP_MIN_WORDS = 8
+EXPORT_DIR = "export"
+# Items written between fsyncs of the JSONL export
+EXPORT_FSYNC_EVERY = 50
+PDF_OUTPUT = "course_content.pdf"
+# Title of the PDF of a single-course crawl; defaults to the course name,
+# e.g. "Agents Course". Each course of a multi-course crawl is titled after
+# its name.
+#PDF_TITLE = "Hugging Face Agents Course"
+
+# Chunks for the embedding index. Each run writes only the chunks that are
+# new or changed since the chunks recorded in CHUNKS_STATE_FILE, plus
+# deletion records for chunks that disappeared.
+CHUNKS_OUTPUT = "export/chunks.jsonl"
+CHUNKS_STATE_FILE = "export/chunks.sqlite3"
+# Approximate tokens (about four characters each) per chunk, and repeated
+# between consecutive chunks of a section
+CHUNK_MAX_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+
+# Full-text index of every content block, queried with
+# python -m WebScraper.search "some words"
+SEARCH_INDEX_FILE = "export/search.sqlite3"
+# Indexed pages per transaction
+SEARCH_BATCH_SIZE = 100
+
+# Number of items the PDF pipeline keeps in memory before spilling them to
+# disk (PIPELINE_SPILL_DIR, or a temporary directory when unset)
+PIPELINE_SPILL_THRESHOLD = 500
+
+# Cache rendered PDF pages by content hash so re-exports only lay out pages
+# that changed. Remove to build the PDF in a single ReportLab pass.
+PDF_FRAGMENT_CACHE_DIR = "pdfcache"
+# Least recently used fragments are deleted after a build once the cache
+# passes this many bytes (0 keeps everything). Fragments of the PDF just
+# built are always kept.
+PDF_FRAGMENT_CACHE_MAX_SIZE = 512 * 1024 ** 2
+
+# Render units on this many worker processes and merge them into the final
+# PDF. 1 renders everything in the crawler process.
+PDF_RENDER_WORKERS = 1
+
+# Include the bonus units in the PDF, in their place in the course
+PDF_INCLUDE_BONUS_UNITS = False
+
+# Lay out pages on PDF_RENDER_WORKERS background processes as they are
+# scraped, so when the crawl ends only the pages still in flight and the
+# final assembly remain. Uses a temporary fragment cache when
+# PDF_FRAGMENT_CACHE_DIR is unset.
+PDF_RENDER_BACKGROUND = True
+
+# Colour code blocks by their language. Needs Pygments, which is optional;
+# without it code blocks stay plain.
+PDF_CODE_HIGHLIGHT = False
+
+# Per-stage latency and throughput instrumentation, exported when the
+# spider closes
+SPIDER_MIDDLEWARES = {
+   "WebScraper.middlewares.WebscraperSpiderMiddleware": 543,
 }
+DOWNLOADER_MIDDLEWARES = {
+   "WebScraper.middlewares.WebscraperDownloaderMiddleware": 543,
+   "WebScraper.middlewares.AssetFilterMiddleware": 550,
+}
+METRICS_JSON_FILE = "crawl_metrics.json"
+METRICS_PROMETHEUS_FILE = "crawl_metrics.prom"
+
+# Links to images, notebooks, archives and other non-HTML files are not
+# downloaded: they are rejected by extension (Scrapy's usual list, a few
+# course-specific ones and ASSET_FILTER_EXTENSIONS) or guessed MIME type,
+# and downloads stop as soon as the Content-Type is not HTML or the body
+# passes ASSET_FILTER_MAX_SIZE bytes. ASSET_FILTER_HEAD_PROBE checks URLs
+# with an unknown extension with a HEAD request before fetching them.
+ASSET_FILTER_ENABLED = True
+ASSET_FILTER_EXTENSIONS = []
+ASSET_FILTER_MAX_SIZE = 10 * 1024 * 1024
+ASSET_FILTER_HEAD_PROBE = False
 
 # Enable and configure the AutoThrottle extension
 AUTOTHROTTLE_ENABLED = True
@@ -34,7 +149,36 @@ HTTPCACHE_ENABLED = True
 HTTPCACHE_EXPIRATION_SECS = 0
 HTTPCACHE_DIR = "httpcache"
 HTTPCACHE_IGNORE_HTTP_CODES = []
-HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# Compressed, content-addressed cache in a single SQLite file under
+# HTTPCACHE_DIR. Least recently used responses are evicted past
+# HTTPCACHE_MAX_SIZE bytes of stored data (0 keeps everything).
+HTTPCACHE_STORAGE = "WebScraper.httpcache.SQLiteCacheStorage"
+HTTPCACHE_MAX_SIZE = 2 * 1024 ** 3
+# "zstd", "gzip" or "identity"; defaults to zstd when it is available
+# HTTPCACHE_COMPRESSION = "gzip"
+# Re-crawl against the cache with conditional requests: pages answering
+# 304 Not Modified are served from the cache and flagged as unchanged, so
+# a refresh of an unchanged course only costs headers
+# HTTPCACHE_POLICY = "WebScraper.httpcache.RevalidatingPolicy"
+
+# Offline replay profile, applied on top of the settings above when
+# REPLAY_MODE is set (scrapy crawl website -s REPLAY_MODE=1). Responses are
+# served only from the HTTP cache, pages missing from it are skipped instead
+# of downloaded, and politeness delays are off since nothing hits the site.
+REPLAY_MODE = False
+REPLAY_SETTINGS = {
+    "HTTPCACHE_ENABLED": True,
+    "HTTPCACHE_IGNORE_MISSING": True,
+    "HTTPCACHE_EXPIRATION_SECS": 0,
+    "HTTPCACHE_POLICY": "scrapy.extensions.httpcache.DummyPolicy",
+    "ROBOTSTXT_OBEY": False,
+    "DOWNLOAD_DELAY": 0,
+    "RANDOMIZE_DOWNLOAD_DELAY": False,
+    "AUTOTHROTTLE_ENABLED": False,
+    "RETRY_ENABLED": False,
+    "CONCURRENT_REQUESTS": 64,
+    "CONCURRENT_REQUESTS_PER_DOMAIN": 64,
+}
 
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
@@ -1,145 +1,243 @@
 import scrapy
+import time
+from scrapy import signals
 from urllib.parse import urljoin
-from ..items import WebscraperItem, ContentBlock
-from collections import defaultdict
-import re
+from ..items import Block, Page
+from ..course import (
+    CourseIndex, course_name, manifest_path, navigation_links, sitemap_links,
+    structure_from_links
+)
+from ..checkpoint import CrawlCheckpoint
+from ..urls import SeenSet, canonicalize_url
 
 class WebsiteSpider(scrapy.Spider):
     name = 'website'
     max_depth = 5
+    heading_tags = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+    metrics = None  # CrawlMetrics, set by the instrumentation middlewares
     
-    def __init__(self, url=None, *args, **kwargs):
+    def __init__(self, url=None, eager=False, checkpoint=None, course=None, refresh=False,
+                 *args, **kwargs):
         super(WebsiteSpider, self).__init__(*args, **kwargs)
         self.start_urls = [url] if url else []
-        self.base_url = "https://huggingface.co/learn/agents-course/"
-        self.visited = set()  # Track visited URLs
+        # Seed every known section up front instead of chaining page by page
+        self.eager = str(eager).lower() in ('1', 'true', 'yes')
+        # Roots of the courses to crawl, comma separated; every section of a
+        # course lives under its root
+        if isinstance(course, str):
+            course = course.split(',')
+        self.courses = {}  # Course name -> root URL, in the given order
+        for base_url in course or ["https://huggingface.co/learn/agents-course/"]:
+            base_url = base_url.strip()
+            if not base_url.endswith('/'):
+                base_url += '/'
+            name = course_name(base_url)
+            if self.courses.get(name, base_url) != base_url:
+                raise ValueError(f"Courses {self.courses[name]} and {base_url} share the name {name!r}")
+            self.courses[name] = base_url
+        # (root, name) pairs, deepest root first so nested courses match first
+        self.course_roots = sorted(
+            ((canonicalize_url(base_url) + '/', name) for name, base_url in self.courses.items()),
+            key=lambda root: len(root[0]), reverse=True
+        )
+        # Rediscover the course structure even if a fresh manifest exists
+        self.refresh = str(refresh).lower() in ('1', 'true', 'yes')
+        self.manifest_dir = 'manifests'
+        self.manifest_max_age = 0
+        self.visited = set()  # Canonical URLs of parsed pages
+        self.seen = SeenSet()  # Canonical URLs already requested
         
-        # Pre-defined navigation structure matching exact course order
-        self.unit_structure = {
-            'unit0': {
-                'title': 'WELCOME TO THE COURSE',
-                'type': 'main',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Welcome to the course 👋'},
-                    {'path': 'discord101', 'title': 'Discord 101', 'optional': True},
-                    {'path': 'onboarding', 'title': 'Onboarding', 'optional': True}
-                ]
-            },
-            'unit1': {
-                'title': 'INTRODUCTION TO AGENTS',
-                'type': 'main',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Introduction'},
-                    {'path': 'quiz1', 'title': 'Quick Quiz 1', 'is_quiz': True},
-                    {'path': 'what-are-llms', 'title': 'What are LLMs?'},
-                    {'path': 'messages-and-special-tokens', 'title': 'Messages and Special Tokens'},
-                    {'path': 'tools', 'title': 'What are Tools?'},
-                    {'path': 'quiz2', 'title': 'Quick Quiz 2', 'is_quiz': True},
-                    {'path': 'agent-steps-and-structure', 'title': 'Understanding AI Agents through the Thought-Action-Observation Cycle'},
-                    {'path': 'thoughts', 'title': 'Thoughts: Internal Reasoning and the Be-An-AgentPlus'},
-                    {'path': 'actions', 'title': 'Actions: Enabling the Agent to Engage with its Environment'},
-                    {'path': 'observations', 'title': 'Observe: Integrating Feedback to Reflect and Adapt'},
-                    {'path': 'dummy-agent-library', 'title': 'Dummy Agent Library'},
-                    {'path': 'tutorial', 'title': "Let's Create Our First Agent Using smokeagents"},
-                    {'path': 'final-quiz', 'title': 'Unit 1 Final Quiz', 'is_quiz': True},
-                    {'path': 'conclusion', 'title': 'Conclusion', 'is_conclusion': True}
-                ]
-            },
-            'unit2': {
-                'title': 'FRAMEWORKS FOR AI AGENTS',
-                'type': 'main',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Frameworks for AI Agents'},
-                    # Unit 2.1
-                    {'path': 'smolagents/introduction', 'title': 'Introduction to smokeagents', 'section': '2.1'},
-                    {'path': 'smolagents/why_use_smolagents', 'title': 'Why use SmokeAgents?', 'section': '2.1'},
-                    {'path': 'smolagents/quiz1', 'title': 'Quick Quiz 1', 'is_quiz': True, 'section': '2.1'},
-                    {'path': 'smolagents/code_agents', 'title': 'Building Agents That Use Code', 'section': '2.1'},
-                    {'path': 'smolagents/tool_calling_agents', 'title': 'Writing actions as code snippets or JSON blobs', 'section': '2.1'},
-                    {'path': 'smolagents/tools', 'title': 'Tools', 'section': '2.1'},
-                    {'path': 'smolagents/retrieval_agents', 'title': 'Retrieval Agents', 'section': '2.1'},
-                    {'path': 'smolagents/quiz2', 'title': 'Quick Quiz 2', 'is_quiz': True, 'section': '2.1'},
-                    {'path': 'smolagents/multi_agent_systems', 'title': 'Multi-Agent Systems', 'section': '2.1'},
-                    {'path': 'smolagents/vision_agents', 'title': 'Vision and Browser agents', 'section': '2.1'},
-                    {'path': 'smolagents/final_quiz', 'title': 'Final Quiz', 'is_quiz': True, 'section': '2.1'},
-                    {'path': 'smolagents/conclusion', 'title': 'Conclusion', 'is_conclusion': True, 'section': '2.1'},
-                    # Unit 2.2
-                    {'path': 'llama-index/introduction', 'title': 'Introduction to LlamaIndex', 'section': '2.2'},
-                    {'path': 'llama-index/llama-hub', 'title': 'Introduction to LlamaHub', 'section': '2.2'},
-                    {'path': 'llama-index/components', 'title': 'What are Components in LlamaIndex?', 'section': '2.2'},
-                    {'path': 'llama-index/tools', 'title': 'Using Tools in LlamaIndex', 'section': '2.2'},
-                    {'path': 'llama-index/quiz1', 'title': 'Quick Quiz 1', 'is_quiz': True, 'section': '2.2'},
-                    {'path': 'llama-index/agents', 'title': 'Using Agents in LlamaIndex', 'section': '2.2'},
-                    {'path': 'llama-index/workflows', 'title': 'Creating Agents Workflows in LlamaIndex', 'section': '2.2'},
-                    {'path': 'llama-index/quiz2', 'title': 'Quick Quiz 2', 'is_quiz': True, 'section': '2.2'},
-                    {'path': 'llama-index/conclusion', 'title': 'Conclusion', 'is_conclusion': True, 'section': '2.2'},
-                    # Unit 2.3
-                    {'path': 'langgraph/introduction', 'title': 'Introduction to LangGraph', 'section': '2.3'},
-                    {'path': 'langgraph/when_to_use_langgraph', 'title': 'What is LangGraph?', 'section': '2.3'},
-                    {'path': 'langgraph/building_blocks', 'title': 'Building Blocks of LangGraph', 'section': '2.3'},
-                    {'path': 'langgraph/first_graph', 'title': 'Building Your First LangGraph', 'section': '2.3'},
-                    {'path': 'langgraph/document_analysis_agent', 'title': 'Document Analysis Graph', 'section': '2.3'},
-                    {'path': 'langgraph/quiz1', 'title': 'Quick Quiz 1', 'is_quiz': True, 'section': '2.3'},
-                    {'path': 'langgraph/conclusion', 'title': 'Conclusion', 'is_conclusion': True, 'section': '2.3'}
-                ]
-            },
-            'unit3': {
-                'title': 'USE CASE FOR AGENTS: RAG',
-                'type': 'main',
-                'sections': [
-                    {'path': 'agentic-rag/introduction', 'title': 'Introduction to Use Case for Agents: RAG'},
-                    {'path': 'agentic-rag/agentic-rag', 'title': 'Agentic Retrieval Augmented Generation (RAG)'},
-                    {'path': 'agentic-rag/invitees', 'title': 'Creating a RAG Tool for Guest Stories'},
-                    {'path': 'agentic-rag/tools', 'title': 'Building and Integrating Tools for Your Agent'},
-                    {'path': 'agentic-rag/agent', 'title': 'Creating Your Own Agent'},
-                    {'path': 'agentic-rag/conclusion', 'title': 'Conclusion', 'is_conclusion': True}
-                ]
-            },
-            'unit4': {
-                'title': 'FINAL PROJECT - CREATE, TEST, AND CERTIFY YOUR AGENT',
-                'type': 'main',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Introduction to Final Test'},
-                    {'path': 'what-is-gaia', 'title': 'What is GAIA?'},
-                    {'path': 'hands-on', 'title': 'The Final Hands-On'},
-                    {'path': 'get-your-certificate', 'title': 'Get Your Certificate Of Excellence'},
-                    {'path': 'conclusion', 'title': 'Conclusion of the Course', 'is_conclusion': True},
-                    {'path': 'additional-readings', 'title': 'What Should You Learn Next!'}
-                ]
-            },
-            'bonus-unit1': {
-                'title': 'FINE-TUNING AN LLM FOR FUNCTION CALLING',
-                'type': 'bonus',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Introduction'},
-                    {'path': 'what-is-function-calling', 'title': 'What is Function Calling?'},
-                    {'path': 'fine-tuning', 'title': "Let's Fine Tune your model for Function calling"},
-                    {'path': 'conclusion', 'title': 'Conclusion', 'is_conclusion': True}
-                ]
-            },
-            'bonus-unit2': {
-                'title': 'AGENT OBSERVABILITY AND EVALUATION',
-                'type': 'bonus',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Introduction'},
-                    {'path': 'observability', 'title': 'What is agent observability and evaluation?'},
-                    {'path': 'monitoring', 'title': 'Monitoring and evaluating agents'},
-                    {'path': 'quiz', 'title': 'Quiz', 'is_quiz': True}
-                ]
-            },
-            'bonus-unit3': {
-                'title': 'AGENTS VS GAMES WITH POKEMON',
-                'type': 'bonus',
-                'sections': [
-                    {'path': 'introduction', 'title': 'Introduction'},
-                    {'path': 'state-of-art', 'title': 'The State of the Art in Using LLM in Games'},
-                    {'path': 'from-llm-to-agents', 'title': 'From LLMs to AI Agents'},
-                    {'path': 'building_your_pokemon_agent', 'title': 'Build Your Own Pokemon Battle Agent'},
-                    {'path': 'launching_agent_battle', 'title': 'Launching Your Pokemon Battle Agent'},
-                    {'path': 'conclusion', 'title': 'Conclusion', 'is_conclusion': True}
-                ]
-            }
-        }
+        # Resume from (and keep updating) a checkpoint file when one is given
+        self.checkpoint = CrawlCheckpoint(checkpoint) if checkpoint else None
+        # Requests still pending when the previous run stopped, read before
+        # this run records any of its own
+        self.resumed_frontier = []
+        if self.checkpoint:
+            self.visited = self.checkpoint.visited_urls()
+            for url in self.visited:
+                self.seen.add(url)
+            self.resumed_frontier = self.checkpoint.frontier()
+        
+        # Structure of each course, loaded from its manifest or discovered
+        # from the site's navigation when the crawl starts
+        self.course_indexes = {}
+        self.unlisted = set()
+        
+    @classmethod
+    def update_settings(cls, settings):
+        super(WebsiteSpider, cls).update_settings(settings)
+        # Replay profile overrides project settings but not -s options
+        if settings.getbool('REPLAY_MODE'):
+            settings.setdict(settings.getdict('REPLAY_SETTINGS'), priority='spider')
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        kwargs.setdefault('checkpoint', crawler.settings.get('CHECKPOINT_FILE'))
+        spider = super(WebsiteSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.seen.exact_limit = crawler.settings.getint('SEEN_URLS_EXACT_LIMIT', spider.seen.exact_limit)
+        spider.manifest_dir = crawler.settings.get('COURSE_MANIFEST_DIR', spider.manifest_dir)
+        spider.manifest_max_age = crawler.settings.getint('COURSE_MANIFEST_MAX_AGE', 0)
+        crawler.signals.connect(spider.request_dropped, signal=signals.request_dropped)
+        return spider
+
+    def request_dropped(self, request, spider):
+        # Duplicates rejected by the scheduler will never be fetched. Only
+        # the request holding a URL's frontier row frees it; a copy, e.g. a
+        # redirect to that URL, leaves it to the request still in flight.
+        if self.checkpoint and request.meta.get('frontier_url') == canonicalize_url(request.url):
+            self.checkpoint.discard(request.meta['frontier_url'])
+
+    def closed(self, reason):
+        if self.checkpoint:
+            self.checkpoint.close()
+        if self.unlisted:
+            self.logger.warning(
+                "%d crawled pages are missing from the course structure; "
+                "run with -a refresh=1 to rediscover it", len(self.unlisted)
+            )
+
+    async def start(self):
+        # Scrapy >= 2.13 entry point; older versions call start_requests directly
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        for name, base_url in self.courses.items():
+            manifest = manifest_path(self.manifest_dir, base_url)
+            index = None if self.refresh else CourseIndex.from_manifest(manifest, self.manifest_max_age)
+            if index is not None:
+                yield from self.course_ready(name, index)
+                continue
+
+            # Discover the structure from the navigation of the first page;
+            # requests outside the course wait until it is known
+            url = self.start_urls[0] if self.start_urls and len(self.courses) == 1 else base_url
+            yield scrapy.Request(url, callback=self.parse_structure, errback=self.structure_failed,
+                                 dont_filter=True, cb_kwargs={'course': name, 'manifest': manifest})
+
+    def parse_structure(self, response, course, manifest):
+        sitemap = response.meta.get('sitemap', False)
+        links = sitemap_links(response) if sitemap else navigation_links(response)
+        # Keep flags added by hand to an earlier manifest
+        previous = CourseIndex.from_manifest(manifest)
+        units = structure_from_links(self.courses[course], links,
+                                     previous.unit_structure if previous else None)
+        if not units and not sitemap:
+            self.logger.info("No course navigation on %s, trying the sitemap", response.url)
+            yield self.sitemap_request(course, manifest)
+            return
+
+        yield from self.course_ready(course, self.discovered(course, units, manifest))
+        if not sitemap:
+            # The discovery page is a course page too
+            self.seen.add(canonicalize_url(response.url))
+            yield from self.parse(response)
+
+    def structure_failed(self, failure):
+        request = failure.request
+        course, manifest = request.cb_kwargs['course'], request.cb_kwargs['manifest']
+        if not request.meta.get('sitemap'):
+            self.logger.info("Could not fetch %s (%s), trying the sitemap",
+                             request.url, failure.getErrorMessage())
+            yield self.sitemap_request(course, manifest)
+            return
+        # Fall back to the last known structure, however old, without
+        # refreshing the manifest
+        index = CourseIndex.from_manifest(manifest)
+        if index is None:
+            index = self.discovered(course, {}, manifest)
+        else:
+            self.logger.warning("Could not rediscover the structure of %s, using %s",
+                                self.courses[course], manifest)
+        yield from self.course_ready(course, index)
+
+    def sitemap_request(self, course, manifest):
+        return scrapy.Request(urljoin(self.courses[course], '/sitemap.xml'),
+                              callback=self.parse_structure, errback=self.structure_failed,
+                              dont_filter=True, meta={'sitemap': True, 'dont_filter_assets': True},
+                              cb_kwargs={'course': course, 'manifest': manifest})
+
+    def discovered(self, course, units, manifest):
+        index = CourseIndex(self.courses[course], units)
+        if not units:
+            self.logger.error("Could not discover the structure of %s; every page "
+                              "will be reported as unlisted", self.courses[course])
+        else:
+            index.save_manifest(manifest)
+            self.logger.info("Discovered %d sections in %d units, saved to %s",
+                             len(index), len(units), manifest)
+        return index
+
+    def course_ready(self, course, index):
+        """Requests to make once the structure of a course is known"""
+        self.course_indexes[course] = index
+        if self.eager:
+            # Every section is known in advance, so request them all at once and
+            # let the scheduler fetch them concurrently. Priorities follow the
+            # course order, so several courses are crawled side by side; export
+            # order comes from global_order regardless.
+            total = len(index)
+            for section in index:
+                request = self.make_request(section.url, priority=total - section.global_order)
+                if request:
+                    yield request
+        elif not self.start_urls and index.sections:
+            # Chain through the course from its first section
+            request = self.make_request(index.sections[0].url, priority=len(index))
+            if request:
+                yield request
+        if len(self.course_indexes) < len(self.courses):
+            return
+
+        # The remaining requests may lead into any course, so they wait
+        # until every structure is known
+        if self.checkpoint:
+            # Requests that were still pending when the previous run stopped,
+            # unless this run has already made them
+            for url, priority in self.resumed_frontier:
+                if url not in self.seen:
+                    self.seen.add(url)
+                    yield scrapy.Request(url, callback=self.parse, priority=priority,
+                                         meta={'frontier_url': url})
+            self.resumed_frontier = []
+                
+        for url in self.start_urls:
+            if not self.eager or not self.find_section(url):
+                request = self.make_request(url, dont_filter=True)
+                if request:
+                    yield request
+
+    def course_of(self, url):
+        """Name of the course whose root url is under, or None"""
+        for root, name in self.course_roots:
+            if url.startswith(root):
+                return name
+        return None
+
+    def find_section(self, url):
+        """CourseSection of url in the structure of its course, or None"""
+        index = self.course_indexes.get(self.course_of(url))
+        return index.get(url) if index else None
+
+    def make_request(self, url, priority=0, **kwargs):
+        """Build a parse request for the canonical form of url.
+
+        Returns None when that page was already requested or parsed, so
+        near-duplicate links are dropped before a Request is allocated and
+        every pending URL in the checkpoint frontier is held by exactly one
+        request.
+        """
+        url = canonicalize_url(url)
+        if url in self.seen:
+            if hasattr(self, 'crawler'):
+                self.crawler.stats.inc_value('dupefilter/canonical_suppressed')
+            return None
+        self.seen.add(url)
+        request = scrapy.Request(url, callback=self.parse, priority=priority, **kwargs)
+        if self.checkpoint:
+            self.checkpoint.push(url, priority)
+            request.meta['frontier_url'] = url
+        return request
         
     def safe_extract_text(self, element, selector='::text', join_texts=True):
         """Safely extract text from an element"""
@@ -158,143 +256,177 @@ class WebsiteSpider(scrapy.Spider):
         if not main_content:
             main_content = response.css('body')  # Fallback to body if no main/article
         
-        if main_content:
-            # Process headings
-            for heading_level in range(1, 7):
-                for heading in main_content.css(f'h{heading_level}'):
-                    text = self.safe_extract_text(heading)
-                    if text:
-                        block = ContentBlock(
-                            type='heading',
-                            content=text,
-                            level=heading_level
-                        )
-                        blocks.append(block)
-                    
-                    # Get content until next heading
-                    next_elements = heading.xpath('./following-sibling::*')
-                    for element in next_elements:
-                        if element.css('h1, h2, h3, h4, h5, h6'):
-                            break
-                            
-                        # Process paragraphs
-                        if element.root.tag == 'p':
-                            text = self.safe_extract_text(element)
-                            if text:
-                                block = ContentBlock(
-                                    type='paragraph',
-                                    content=text
-                                )
-                                blocks.append(block)
-                            
-                        # Process code blocks
-                        elif element.root.tag == 'pre' or element.css('.highlight'):
-                            code_content = element.css('code ::text').getall()
-                            if code_content:
-                                block = ContentBlock(
-                                    type='code',
-                                    content='\n'.join(line.strip() for line in code_content),
-                                    language=element.css('[class*="language-"]::attr(class)').re_first(r'language-(\w+)') or 'text'
-                                )
-                                blocks.append(block)
-                                
-                        # Process lists
-                        elif element.root.tag in ['ul', 'ol']:
-                            items = []
-                            for item in element.css('li'):
-                                text = self.safe_extract_text(item)
-                                if text:
-                                    items.append(text)
-                            if items:
-                                block = ContentBlock(
-                                    type='list',
-                                    items=items,
-                                    level=1
-                                )
-                                blocks.append(block)
+        # Nested matches (e.g. a <main> inside another <main>) are covered by
+        # their outermost container, so each element is visited only once
+        roots = []
+        seen = set()
+        for container in main_content:
+            root = container.root
+            if not any(ancestor in seen for ancestor in root.iterancestors()):
+                roots.append(root)
+            seen.add(root)
+        
+        # Mark every element that has a heading somewhere below it. Only those
+        # subtrees need to be descended into; everything else is either a
+        # content element of the current heading or ignored.
+        has_heading = set()
+        for root in roots:
+            for heading in root.iter(*self.heading_tags):
+                for ancestor in heading.iterancestors():
+                    if ancestor in has_heading:
+                        break
+                    has_heading.add(ancestor)
+                    if ancestor is root:
+                        break
+        
+        for root in roots:
+            self._walk_content(root, has_heading, blocks)
             
         return blocks
+
+    def _walk_content(self, node, has_heading, blocks):
+        """Emit the blocks below node in document order"""
+        # Content belongs to a heading when it follows it as a sibling, up to
+        # the next sibling that is or contains a heading
+        in_section = False
+        for child in node.iterchildren():
+            if not isinstance(child.tag, str):
+                continue  # Comments and processing instructions
+                
+            if child.tag in self.heading_tags:
+                text = self.safe_extract_text(scrapy.Selector(root=child, type='html'))
+                if text:
+                    blocks.append(Block(
+                        type='heading',
+                        content=text,
+                        level=int(child.tag[1])
+                    ))
+                in_section = True
+                
+            elif child in has_heading:
+                in_section = False
+                self._walk_content(child, has_heading, blocks)
+                
+            elif in_section:
+                block = self.element_to_block(scrapy.Selector(root=child, type='html'))
+                if block:
+                    blocks.append(block)
+
+    def element_to_block(self, element):
+        """Convert a paragraph, code or list element to a Block"""
+        # Process paragraphs
+        if element.root.tag == 'p':
+            text = self.safe_extract_text(element)
+            if text:
+                return Block(
+                    type='paragraph',
+                    content=text
+                )
+            
+        # Process code blocks
+        elif element.root.tag == 'pre' or element.css('.highlight'):
+            code_content = element.css('code ::text').getall()
+            if code_content:
+                return Block(
+                    type='code',
+                    content='\n'.join(line.strip() for line in code_content),
+                    language=element.css('[class*="language-"]::attr(class)').re_first(r'language-(\w+)') or 'text'
+                )
+                
+        # Process lists
+        elif element.root.tag in ['ul', 'ol']:
+            items = []
+            for item in element.css('li'):
+                text = self.safe_extract_text(item)
+                if text:
+                    items.append(text)
+            if items:
+                return Block(
+                    type='list',
+                    items=items,
+                    level=1
+                )
+                
+        return None
     
     def parse(self, response):
-        if response.url in self.visited:
+        url = canonicalize_url(response.url)
+        if url in self.visited:
             return
         
-        self.visited.add(response.url)
+        self.visited.add(url)
         
-        # Extract unit and section info from URL
-        unit_match = re.search(r'(bonus-)?unit(\d+)', response.url)
-        if not unit_match or not response.url.startswith(self.base_url):
-            return
+        # Resolve the page against the precomputed index of its course
+        course = self.course_of(url)
+        section = self.find_section(url)
+        if course:
+            self.crawler.stats.inc_value(f'course/responses/{course}')
+            if not section:
+                self.unlisted_page(url, course)
+        if self.checkpoint and not section:
+            # Pages with an item are marked visited by CheckpointPipeline,
+            # in the same transaction that stores the item
+            redirect_urls = response.meta.get('redirect_urls', [])
+            self.checkpoint.mark_visited(url, *map(canonicalize_url, redirect_urls))
             
-        # Determine unit and section
-        is_bonus = bool(unit_match.group(1))
-        unit_num = unit_match.group(2)
-        unit = f"{'bonus-' if is_bonus else ''}unit{unit_num}"
+        yield from self.parse_section(response, section, course)
         
-        # Extract section path
-        path = response.url.split(unit + '/')[1].rstrip('/')
-        
-        # Find section info in unit structure
-        if unit not in self.unit_structure:
-            return
+        if self.checkpoint:
+            self.checkpoint.commit()
             
-        # Find section info
-        section_info = None
-        for section in self.unit_structure[unit]['sections']:
-            if section['path'] == path:
-                section_info = section
-                break
-                
-        if not section_info:
+    def unlisted_page(self, url, course):
+        # Most likely added or renamed since the structure was discovered
+        if url not in self.unlisted:
+            self.unlisted.add(url)
+            self.crawler.stats.inc_value('course/unlisted_pages')
+            self.crawler.stats.inc_value(f'course/unlisted_pages/{course}')
+            self.logger.info("Page not in the course structure: %s", url)
+
+    def parse_section(self, response, section, course):
+        if not section:
             return
             
-        # Calculate global order
-        global_order = 0
-        for u, data in self.unit_structure.items():
-            if u == unit:
-                global_order += data['sections'].index(section_info)
-                break
-            global_order += len(data['sections'])
-            
         # Create item with all metadata
-        item = WebscraperItem()
+        item = Page()
         item['url'] = response.url
-        item['title'] = section_info['title']
+        item['title'] = section.title
+        item['course'] = course
+        started = time.perf_counter()
         item['content_blocks'] = self.extract_content_blocks(response)
+        if self.metrics:
+            self.metrics.observe('extract_seconds', time.perf_counter() - started)
+            self.metrics.observe('blocks_per_page', len(item['content_blocks']))
         item['depth'] = 0
         item['parent_url'] = None
-        item['unit'] = unit
-        item['unit_order'] = self.unit_structure[unit]['sections'].index(section_info) + 1
-        item['section_type'] = self.unit_structure[unit]['type']
-        item['section_number'] = section_info.get('section', '')
-        item['is_optional'] = section_info.get('optional', False)
-        item['is_quiz'] = section_info.get('is_quiz', False)
-        item['is_conclusion'] = section_info.get('is_conclusion', False)
-        item['lesson_type'] = 'Quiz' if item['is_quiz'] else 'Conclusion' if item['is_conclusion'] else 'Introduction' if 'introduction' in path.lower() else 'Content'
-        item['global_order'] = global_order
+        item['unit'] = section.unit
+        item['unit_order'] = section.unit_order
+        item['section_type'] = section.section_type
+        item['section_number'] = section.section_number
+        item['is_optional'] = section.is_optional
+        item['is_quiz'] = section.is_quiz
+        item['is_conclusion'] = section.is_conclusion
+        item['lesson_type'] = section.lesson_type
+        item['global_order'] = section.global_order
+        # Only a 304 from the server says the page is the one crawled last time
+        item['unchanged'] = 'revalidated' in response.flags
         
+        self.crawler.stats.inc_value(f'course/items/{course}')
         yield item
         
-        # Find and queue next section
-        current_index = self.unit_structure[unit]['sections'].index(section_info)
-        if current_index + 1 < len(self.unit_structure[unit]['sections']):
-            # Next section in same unit
-            next_section = self.unit_structure[unit]['sections'][current_index + 1]
-            next_url = f"{self.base_url}{unit}/{next_section['path']}"
-            if next_url not in self.visited:
-                yield scrapy.Request(next_url, callback=self.parse, priority=10)
-        elif not is_bonus:
-            # Try next main unit
-            next_unit_num = int(unit_num) + 1
-            next_unit = f"unit{next_unit_num}"
-            if next_unit in self.unit_structure:
-                first_section = self.unit_structure[next_unit]['sections'][0]
-                next_url = f"{self.base_url}{next_unit}/{first_section['path']}"
-                if next_url not in self.visited:
-                    yield scrapy.Request(next_url, callback=self.parse, priority=5)
+        # Queue next section (next in unit, or first of the next main unit).
+        # In eager mode it has already been scheduled with the course.
+        if not self.eager and section.next_url:
+            request = self.make_request(section.next_url, priority=section.next_priority)
+            if request:
+                yield request
                     
-        # Also collect other course links with lower priority
+        # Also collect other course links with lower priority. In eager mode
+        # this is only a fallback for pages the course structure doesn't list.
         for href in response.css('a::attr(href)').getall():
             url = urljoin(response.url, href)
-            if url.startswith(self.base_url) and url not in self.visited:
-                yield scrapy.Request(url, callback=self.parse, priority=0)
\ No newline at end of file
+            if self.eager and self.find_section(url):
+                continue
+            if self.course_of(url):
+                request = self.make_request(url, priority=0)
+                if request:
+                    yield request
\ No newline at end of file
@@ -0,0 +1,81 @@
+import heapq
+import json
+import os
+import shutil
+import tempfile
+
+from itemadapter import ItemAdapter
+
+from .items import CompactItem
+
+
+class ItemSpillBuffer:
+    """Sorted item buffer with bounded memory.
+
+    Items are held in memory until ``threshold`` of them have accumulated,
+    then written to disk as a sorted JSONL segment. Iterating the buffer
+    streams every segment and the in-memory tail back through a k-way merge,
+    so only one item per segment is resident at a time.
+
+    Sort keys must survive a JSON round trip, so use lists of numbers and
+    strings rather than tuples. Compact items are held as they are rather
+    than copied, so add a copy if the item may still change; items read
+    back from disk are plain dicts either way.
+    """
+
+    def __init__(self, threshold=500, directory=None):
+        self.threshold = threshold
+        self.directory = directory
+        self._owns_directory = directory is None
+        self.segments = []
+        self.pending = []
+        self.count = 0
+
+    def add(self, key, item):
+        if not isinstance(item, CompactItem):
+            item = ItemAdapter(item).asdict()
+        self.pending.append((list(key), item))
+        self.count += 1
+        if self.threshold and len(self.pending) >= self.threshold:
+            self.spill()
+
+    def spill(self):
+        if not self.pending:
+            return
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='webscraper-spill-')
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = os.path.join(self.directory, f'segment-{len(self.segments):05d}.jsonl')
+        self.pending.sort(key=lambda record: record[0])
+        with open(path, 'w', encoding='utf-8') as f:
+            for key, item in self.pending:
+                f.write(json.dumps([key, item], ensure_ascii=False, default=dict))
+                f.write('\n')
+        self.segments.append(path)
+        self.pending = []
+
+    def _read_segment(self, path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                key, item = json.loads(line)
+                yield key, item
+
+    def __iter__(self):
+        """Yield (key, item) pairs in key order"""
+        runs = [self._read_segment(path) for path in self.segments]
+        runs.append(iter(sorted(self.pending, key=lambda record: record[0])))
+        return heapq.merge(*runs, key=lambda record: record[0])
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self._owns_directory and self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+        else:
+            for path in self.segments:
+                os.remove(path)
+        self.pending = []
+        self.segments = []
@@ -0,0 +1,126 @@
+import hashlib
+import math
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = frozenset({
+    'fw',  # Framework switcher on the Hugging Face docs
+    'ref', 'source', 'fbclid', 'gclid', 'mc_cid', 'mc_eid',
+})
+TRACKING_PREFIXES = ('utm_',)
+
+
+def canonicalize_url(url):
+    """Canonical form used to decide whether two URLs are the same page.
+
+    Lowercases the scheme and host, drops the fragment and tracking query
+    parameters, sorts the remaining parameters and strips trailing slashes,
+    so ``/foo``, ``/foo/``, ``/foo#anchor`` and ``/foo?fw=pt`` all map to
+    ``/foo``.
+    """
+    parts = urlsplit(url)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES)
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path,
+                       urlencode(query), ''))
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Enhanced double hashing: k positions from the two 64-bit halves of
+        # a single digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little')
+        positions = []
+        for i in range(self.num_hashes):
+            positions.append(h1 % self.num_bits)
+            h1 += h2
+            h2 += i
+        return positions
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class ScalableBloomFilter:
+    """Bloom filter that grows by chaining larger, stricter filters.
+
+    Each new filter doubles the capacity and halves the error rate, which
+    bounds the overall false positive rate at twice ``error_rate``.
+    """
+
+    def __init__(self, initial_capacity=100000, error_rate=1e-6):
+        self.filters = [BloomFilter(initial_capacity, error_rate / 2)]
+
+    def add(self, key):
+        if key in self:
+            return
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * 2, current.error_rate / 2)
+            self.filters.append(current)
+        current.add(key)
+
+    def __contains__(self, key):
+        return any(key in bloom for bloom in self.filters)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+
+class SeenSet:
+    """Set of seen URLs that stays compact on very large crawls.
+
+    Membership is exact up to ``exact_limit`` entries; past that the entries
+    move into a scalable Bloom filter, trading a tiny false positive rate
+    for a few bytes per URL.
+    """
+
+    def __init__(self, urls=(), exact_limit=100000, error_rate=1e-6):
+        self.exact_limit = exact_limit
+        self.error_rate = error_rate
+        self.exact = set()
+        self.bloom = None
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        if self.bloom is not None:
+            self.bloom.add(url)
+            return
+        self.exact.add(url)
+        if len(self.exact) > self.exact_limit:
+            self.bloom = ScalableBloomFilter(self.exact_limit * 2, self.error_rate)
+            for seen in self.exact:
+                self.bloom.add(seen)
+            self.exact = set()
+
+    def __contains__(self, url):
+        if self.bloom is not None:
+            return url in self.bloom
+        return url in self.exact
+
+    def __len__(self):
+        if self.bloom is not None:
+            return len(self.bloom)
+        return len(self.exact)
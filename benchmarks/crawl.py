@@ -0,0 +1,47 @@
+"""Crawl a course once and print the crawl rate as JSON.
+
+Run by ``benchmarks.run`` in a fresh process per round, since the Twisted
+reactor can't be restarted:
+
+    python -m benchmarks.crawl http://127.0.0.1:8765/learn/bench-course/
+"""
+import json
+import sys
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from WebScraper.spiders.website_spider import WebsiteSpider
+
+# Only the crawl and extraction are measured: no politeness delays, cache
+# or item pipelines
+SETTINGS = {
+    'ROBOTSTXT_OBEY': False,
+    'DOWNLOAD_DELAY': 0,
+    'AUTOTHROTTLE_ENABLED': False,
+    'HTTPCACHE_ENABLED': False,
+    'ITEM_PIPELINES': {},
+    'METRICS_JSON_FILE': None,
+    'METRICS_PROMETHEUS_FILE': None,
+    'TELNETCONSOLE_ENABLED': False,
+    'LOG_LEVEL': 'WARNING',
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    settings = get_project_settings()
+    settings.setdict(SETTINGS, priority='cmdline')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(WebsiteSpider)
+    process.crawl(crawler, course=argv[0], eager=True, refresh=True)
+    process.start()
+
+    stats = crawler.stats.get_stats()
+    items = stats.get('item_scraped_count', 0)
+    elapsed = stats.get('elapsed_time_seconds') or float('nan')
+    print(json.dumps({'items': items, 'seconds': elapsed, 'pages_per_second': items / elapsed}))
+
+
+if __name__ == '__main__':
+    main()
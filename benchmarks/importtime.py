@@ -0,0 +1,58 @@
+"""Import time of the project's modules, from ``python -X importtime``.
+
+    python -m benchmarks.importtime                        # spider and pipelines
+    python -m benchmarks.importtime WebScraper.pdf -n 20   # any modules, 20 heaviest imports
+
+Every module is imported in a fresh interpreter. The report gives the
+total time the import took and its heaviest imports by cumulative time,
+indented by nesting as in the raw ``-X importtime`` output.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('WebScraper.spiders.website_spider', 'WebScraper.pipelines', 'WebScraper.middlewares')
+
+
+def import_times(module):
+    """(self_us, cumulative_us, depth, name) of every import module triggers"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(self_us), int(cumulative), depth, name.strip()))
+    # Imports done by the interpreter itself end with site
+    start = max((i + 1 for i, row in enumerate(rows) if row[2] == 0 and row[3] == 'site'), default=0)
+    return rows[start:]
+
+
+def total_us(rows):
+    return sum(cumulative for _, cumulative, depth, _ in rows if depth == 0)
+
+
+def report(module, rows, top):
+    print(f"{module}: {total_us(rows) / 1000:.1f} ms, {len(rows)} modules")
+    for self_us, cumulative, depth, name in sorted(rows, key=lambda row: row[1], reverse=True)[:top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {self_us / 1000:>7.1f} ms self  {'  ' * depth}{name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import time of modules")
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('-n', '--top', type=int, default=10, help="heaviest imports to list")
+    args = parser.parse_args(argv)
+    for module in args.modules:
+        report(module, import_times(module), args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Benchmarks against a synthetic course site, with a JSON baseline.
+
+    python -m benchmarks.run                      # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --save               # run and record a new baseline
+    python -m benchmarks.run --only extract,pdf   # run some benchmarks only
+
+``python -m benchmarks.importtime`` breaks the import times of the startup
+benchmark down by module.
+
+Each benchmark is repeated ``--rounds`` times and reported pytest-benchmark
+style (min, median, mean, stddev); the median is compared with the
+baseline. The exit status is 1 when a metric is worse than the baseline by
+more than ``--tolerance``. Timings depend on the machine, so record the
+baseline where the comparison will run.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import io
+import tracemalloc
+
+import scrapy
+from scrapy.http import HtmlResponse
+
+from WebScraper import codeblocks
+from WebScraper.items import Block, ContentBlock
+from WebScraper.pdf import WebscraperPipeline
+from WebScraper.rendering import OutlineDocTemplate
+from WebScraper.spiders.website_spider import WebsiteSpider
+
+from .importtime import import_times, total_us
+from .site import CourseServer, CourseSite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+def summarize(name, samples, unit, better='lower'):
+    return {
+        'name': name,
+        'unit': unit,
+        'better': better,
+        'rounds': len(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'mean': statistics.mean(samples),
+        'stddev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'median': statistics.median(samples),
+    }
+
+
+def site_responses(site, base_url):
+    return [HtmlResponse(url=base_url.rstrip('/') + path[len(site.root) - 1:],
+                         body=site.pages[path], encoding='utf-8')
+            for path, _ in site.sections]
+
+
+def site_items(site, spider, responses):
+    """Items as the spider would yield them, with blocks as plain dicts"""
+    items = []
+    for order, ((path, title), response) in enumerate(zip(site.sections, responses)):
+        unit = path[len(site.root):].split('/', 1)[0]
+        items.append({
+            'url': response.url,
+            'title': title,
+            'content_blocks': [dict(block) for block in spider.extract_content_blocks(response)],
+            'unit': unit,
+            'unit_order': order,
+            'global_order': order,
+            'section_type': 'main',
+        })
+    return items
+
+
+def bench_crawl(site, args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+               SCRAPY_SETTINGS_MODULE='WebScraper.settings')
+    samples = []
+    with CourseServer(site, latency=args.latency) as server:
+        for _ in range(args.crawl_rounds):
+            with tempfile.TemporaryDirectory() as workdir:
+                output = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.crawl', server.url],
+                    cwd=workdir, env=env, check=True, capture_output=True, text=True
+                ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if result['items'] != len(site):
+                raise RuntimeError(f"Crawled {result['items']} of {len(site)} pages")
+            samples.append(result['pages_per_second'])
+    return [summarize('crawl_pages_per_second', samples, 'pages/s', better='higher')]
+
+
+def bench_extract(site, args):
+    spider = WebsiteSpider()
+    responses = site_responses(site, 'http://bench.local/')
+    samples = []
+    for _ in range(args.rounds):
+        for response in responses:
+            # Drop lazily built selectors so every round parses from scratch
+            response._cached_selector = None
+        started = time.perf_counter()
+        for response in responses:
+            spider.extract_content_blocks(response)
+        samples.append((time.perf_counter() - started) / len(responses) * 1e6)
+    return [summarize('extract_us_per_page', samples, 'us')]
+
+
+def bench_pipeline_memory(site, args):
+    spider = WebsiteSpider()
+    items = site_items(site, spider, site_responses(site, 'http://bench.local/'))
+    samples = []
+    for _ in range(max(1, args.rounds // 2)):
+        pipeline = WebscraperPipeline()
+        gc.collect()
+        tracemalloc.start()
+        for item in items:
+            pipeline.process_item(dict(item), spider)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pipeline.items.close()
+        samples.append(peak)
+    return [summarize('pipeline_peak_bytes', samples, 'bytes')]
+
+
+def bench_block_memory(site, args):
+    """Bytes per content block held as a scrapy.Item, a plain dict and a compact Block"""
+    spider = WebsiteSpider()
+    blocks = [dict(block) for item in site_items(site, spider, site_responses(site, 'http://bench.local/'))
+              for block in item['content_blocks']]
+    results = []
+    for name, representation in (('item', ContentBlock), ('dict', dict), ('compact', Block)):
+        samples = []
+        for _ in range(max(1, args.rounds // 2)):
+            gc.collect()
+            tracemalloc.start()
+            held = [representation(block) for block in blocks]
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            # Only the containers are counted: field values are shared with blocks
+            samples.append(current / len(held))
+            del held
+        results.append(summarize(f'block_bytes_{name}', samples, 'bytes'))
+    return results
+
+
+def bench_pdf(site, args):
+    spider = WebsiteSpider()
+    items = site_items(site, spider, site_responses(site, 'http://bench.local/'))
+    samples = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(max(1, args.rounds // 2)):
+            pipeline = WebscraperPipeline(output=os.path.join(workdir, 'course.pdf'))
+            for item in items:
+                pipeline.process_item(dict(item), spider)
+            started = time.perf_counter()
+            pipeline.close_spider(spider)
+            samples.append(time.perf_counter() - started)
+    return [summarize('pdf_render_seconds', samples, 's')]
+
+
+def bench_startup(site, args):
+    """Import times of the spider and pipelines, and the wall time of ``scrapy list``"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    results = []
+    for name, module in (('spider', 'WebScraper.spiders.website_spider'),
+                         ('pipelines', 'WebScraper.pipelines')):
+        samples = [total_us(import_times(module)) / 1000 for _ in range(args.rounds)]
+        results.append(summarize(f'import_{name}_ms', samples, 'ms'))
+    samples = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'scrapy', 'list'], cwd=ROOT, env=env,
+                       check=True, capture_output=True)
+        samples.append(time.perf_counter() - started)
+    results.append(summarize('startup_list_seconds', samples, 's'))
+    return results
+
+
+def bench_code_listing(site, args):
+    """Layout time of one long code listing, plain and syntax-highlighted"""
+    content = site.code_listing(args.listing_lines)
+    results = []
+    for name, highlight in (('plain', False), ('highlighted', True)):
+        pipeline = WebscraperPipeline(code_highlight=highlight)
+        styles = pipeline.create_styles()
+        samples = []
+        for _ in range(max(1, args.rounds // 2)):
+            codeblocks._token_cache.clear()
+            started = time.perf_counter()
+            flowables = pipeline.process_content_block(
+                {'type': 'code', 'content': content, 'language': 'python'}, styles
+            )
+            OutlineDocTemplate(io.BytesIO()).build(flowables)
+            samples.append((time.perf_counter() - started) / args.listing_lines * 1000 * 1000)
+        results.append(summarize(f'code_{name}_ms_per_1000_lines', samples, 'ms'))
+    return results
+
+
+BENCHMARKS = {
+    'crawl': bench_crawl,
+    'extract': bench_extract,
+    'memory': bench_pipeline_memory,
+    'blocks': bench_block_memory,
+    'pdf': bench_pdf,
+    'code': bench_code_listing,
+    'startup': bench_startup,
+}
+
+
+def compare(results, baseline, tolerance):
+    """Print each metric against the baseline; return the names that regressed"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result['name'])
+        if base is None:
+            print(f"  {result['name']}: no baseline")
+            continue
+        ratio = result['median'] / base['median'] if base['median'] else float('inf')
+        worse = ratio > 1 + tolerance if result['better'] == 'lower' else ratio < 1 - tolerance
+        if worse:
+            regressions.append(result['name'])
+        print(f"  {result['name']}: {ratio:.2f}x baseline{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the WebScraper benchmarks")
+    parser.add_argument('--only', help="comma-separated benchmarks: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--units', type=int, default=6)
+    parser.add_argument('--pages', type=int, default=12, help="pages per unit")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--crawl-rounds', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help="server latency in seconds")
+    parser.add_argument('--listing-lines', type=int, default=2000,
+                        help="lines of the code listing benchmark")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    site = CourseSite(units=args.units, pages=args.pages)
+    results = []
+    for name in names:
+        for result in BENCHMARKS[name](site, args):
+            results.append(result)
+            print(f"{result['name']:<26} median {result['median']:>12.4g} {result['unit']:<8}"
+                  f"min {result['min']:.4g}  mean {result['mean']:.4g}  "
+                  f"stddev {result['stddev']:.3g}  rounds {result['rounds']}")
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)['results']
+        baseline.update({result['name']: result for result in results})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'machine': {
+                    'python': platform.python_version(),
+                    'scrapy': scrapy.__version__,
+                    'platform': platform.platform(),
+                    'cpus': os.cpu_count(),
+                },
+                'site': {'units': args.units, 'pages': args.pages, 'latency': args.latency},
+                'results': baseline,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"Compared with {args.baseline}:")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Synthetic course sites served over local HTTP.
+
+    python -m benchmarks.site [--units 6] [--pages 12] [--latency 0.05] [--port 8765]
+"""
+import argparse
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "agent model tool call message token prompt step thought action observation "
+    "memory plan reason answer query context output input system user function "
+    "result error retry policy state graph node edge chain loop task goal data "
+    "the a of to and in is for with that on as by from this it an be are"
+).split()
+
+
+class CourseSite:
+    """Pages of a generated course, keyed by path.
+
+    The course has ``units`` units of ``pages`` pages each, every page with
+    ``headings`` sections of ``paragraphs`` paragraphs. ``code_density``
+    and ``list_density`` are the chances that a section also holds a code
+    block or a list. Every page carries the full navigation sidebar, so the
+    spider can discover the structure from any of them. The same seed
+    always gives the same site.
+    """
+
+    def __init__(self, units=6, pages=12, headings=4, paragraphs=3, code_density=0.5,
+                 list_density=0.5, seed=0, root='/learn/bench-course/'):
+        self.root = root
+        self.random = random.Random(seed)
+        self.sections = []  # (path, title) in course order
+        for unit in range(units):
+            for page in range(pages):
+                title = self.sentence(3).rstrip('.').title()
+                self.sections.append((f"{root}unit{unit}/page-{page}", title))
+
+        nav = ''.join(f'<a href="{path}">{escape(title)}</a>' for path, title in self.sections)
+        self.pages = {root: self.layout("Course", nav, '<h1>Course</h1>')}
+        for path, title in self.sections:
+            body = [f'<h1>{escape(title)}</h1>', f'<p>{self.sentence(20)}</p>']
+            for _ in range(headings):
+                body.append(f'<h2>{escape(self.sentence(4))}</h2>')
+                body.extend(f'<p>{self.paragraph()}</p>' for _ in range(paragraphs))
+                if self.random.random() < code_density:
+                    body.append(self.code_block())
+                if self.random.random() < list_density:
+                    items = ''.join(f'<li>{self.sentence(8)}</li>' for _ in range(4))
+                    body.append(f'<ul>{items}</ul>')
+            self.pages[path] = self.layout(title, nav, ''.join(body))
+
+    def sentence(self, words):
+        text = ' '.join(self.random.choice(WORDS) for _ in range(words))
+        return text[0].upper() + text[1:] + '.'
+
+    def paragraph(self):
+        return ' '.join(self.sentence(self.random.randint(8, 20)) for _ in range(4))
+
+    def code_listing(self, lines):
+        return '\n'.join(f"{self.random.choice(WORDS)}_{i} = call({self.random.choice(WORDS)!r}, step={i})"
+                         for i in range(lines))
+
+    def code_block(self):
+        listing = self.code_listing(self.random.randint(5, 25))
+        return f'<pre><code class="language-python">{escape(listing)}</code></pre>'
+
+    def layout(self, title, nav, main):
+        return (f'<!DOCTYPE html><html><head><title>{escape(title)}</title></head><body>'
+                f'<aside><nav>{nav}</nav></aside><main>{main}</main></body></html>').encode('utf-8')
+
+    def __len__(self):
+        return len(self.sections)
+
+
+class CourseServer:
+    """Serve a CourseSite on localhost, delaying every response by ``latency`` seconds.
+
+    Use as a context manager; ``url`` is the course root.
+    """
+
+    def __init__(self, site, latency=0.0, port=0):
+        self.site = site
+        self.latency = latency
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}{self.site.root}"
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                path = self.path.split('#', 1)[0]
+                body = server.site.pages.get(path) or server.site.pages.get(path.rstrip('/'))
+                if body is None and path == server.site.root.rstrip('/'):
+                    body = server.site.pages[server.site.root]
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic course site")
+    parser.add_argument('--units', type=int, default=6)
+    parser.add_argument('--pages', type=int, default=12, help="pages per unit")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per response")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    site = CourseSite(units=args.units, pages=args.pages, seed=args.seed)
+    with CourseServer(site, latency=args.latency, port=args.port) as server:
+        print(f"Serving {len(site)} pages at {server.url} (Ctrl-C to stop)")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
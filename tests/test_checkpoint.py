@@ -0,0 +1,39 @@
+import scrapy
+
+from WebScraper.checkpoint import CrawlCheckpoint
+from WebScraper.course import CourseIndex
+from WebScraper.spiders.website_spider import WebsiteSpider
+
+BASE = 'https://huggingface.co/learn/agents-course/'
+URLS = [f'{BASE}unit1/{path}' for path in ('introduction', 'tools', 'quiz')]
+
+
+def resumed_spider(tmp_path):
+    path = str(tmp_path / 'checkpoint.sqlite3')
+    checkpoint = CrawlCheckpoint(path)
+    checkpoint.push(URLS[1], 2)
+    checkpoint.push(f'{BASE}unit1/unlisted', 0)
+    checkpoint.close()
+    spider = WebsiteSpider(course=BASE, eager=True, checkpoint=path)
+    index = CourseIndex(BASE, {'unit1': {'type': 'main', 'sections': [
+        {'path': url.rsplit('/', 1)[-1], 'title': url} for url in URLS
+    ]}})
+    return spider, list(spider.course_ready('agents-course', index))
+
+
+def test_resumed_frontier_is_requested_once(tmp_path):
+    spider, requests = resumed_spider(tmp_path)
+    urls = [request.url for request in requests]
+    assert sorted(urls) == sorted(URLS + [f'{BASE}unit1/unlisted'])
+    assert {url for url, _ in spider.checkpoint.frontier()} == set(urls)
+
+
+def test_only_the_owning_request_frees_its_frontier_row(tmp_path):
+    spider, requests = resumed_spider(tmp_path)
+    owner = next(request for request in requests if request.url == URLS[1])
+    # A redirect from another page to the same URL carries that page's meta
+    spider.request_dropped(scrapy.Request(URLS[1], meta={'frontier_url': URLS[0]}), spider)
+    spider.request_dropped(scrapy.Request(URLS[1]), spider)
+    assert URLS[1] in {url for url, _ in spider.checkpoint.frontier()}
+    spider.request_dropped(owner, spider)
+    assert URLS[1] not in {url for url, _ in spider.checkpoint.frontier()}
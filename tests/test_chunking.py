@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+from WebScraper.chunking import approx_tokens, chunk_item
+from WebScraper.pipelines import ChunkingPipeline
+
+URL = 'https://huggingface.co/learn/agents-course/unit1/tools'
+CODE = '\n'.join(f'result_{i} = search_tool.run("query number {i}")' for i in range(40))
+
+
+def sentences(section, count):
+    return ' '.join(f'Sentence {i} of the {section} section explains one more idea.'
+                    for i in range(count))
+
+
+def page(blocks):
+    return {'url': URL, 'unit': 'unit1', 'global_order': 3, 'content_blocks': blocks}
+
+
+BLOCKS = [
+    {'type': 'heading', 'content': 'Tools', 'level': 1},
+    {'type': 'paragraph', 'content': sentences('tools', 30)},
+    {'type': 'code', 'content': CODE, 'language': 'python'},
+    {'type': 'heading', 'content': 'Search', 'level': 2},
+    {'type': 'paragraph', 'content': sentences('search', 30)},
+    {'type': 'heading', 'content': 'Quiz', 'level': 1},
+    {'type': 'list', 'items': ['What is a tool?', 'When is it called?']},
+]
+
+
+def shared(previous, current):
+    """Longest end of previous that current starts with"""
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if current.startswith(previous[-size:]):
+            return previous[-size:]
+    return ''
+
+
+def test_chunks_never_cross_a_heading():
+    chunks = chunk_item(page(BLOCKS), max_tokens=100, overlap_tokens=20)
+    paths = [chunk['heading_path'] for chunk in chunks]
+    assert paths[0] == ['Tools'] and paths[-1] == ['Quiz']
+    assert ['Tools', 'Search'] in paths
+    for chunk in chunks:
+        section = chunk['heading_path'][-1].lower()
+        for other in ('tools', 'search'):
+            if other != section:
+                assert f'of the {other} section' not in chunk['text']
+    assert [chunk['index'] for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_code_blocks_are_never_split():
+    assert approx_tokens(CODE) > 100
+    chunks = chunk_item(page(BLOCKS), max_tokens=100, overlap_tokens=20)
+    holding = [chunk for chunk in chunks if 'result_0 =' in chunk['text']]
+    assert len(holding) == 1
+    assert f'```python\n{CODE}\n```' in holding[0]['text']
+    # Only the chunk holding the code block may pass the limit
+    assert all(chunk['tokens'] <= 100 for chunk in chunks if chunk is not holding[0])
+
+
+def test_overlap_is_bounded():
+    chunks = chunk_item(page(BLOCKS[:2]), max_tokens=60, overlap_tokens=15)
+    assert len(chunks) > 2
+    for previous, current in zip(chunks, chunks[1:]):
+        overlap = shared(previous['text'], current['text'])
+        assert overlap  # Consecutive prose chunks share some text
+        assert approx_tokens(overlap) <= 15
+
+
+def test_rerun_emits_only_changed_chunks_and_deletions(tmp_path):
+    def run(blocks):
+        pipeline = ChunkingPipeline(str(tmp_path / 'chunks.jsonl'), str(tmp_path / 'chunks.sqlite3'),
+                                    max_tokens=100, overlap_tokens=20)
+        pipeline.open_spider(SimpleNamespace())
+        pipeline.process_item(page(blocks), None)
+        pipeline.close_spider(None)
+        with open(tmp_path / 'chunks.jsonl', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    first = run(BLOCKS)
+    assert first and not any(record.get('deleted') for record in first)
+    assert run(BLOCKS) == []  # Nothing changed
+
+    changed = BLOCKS[:-1] + [{'type': 'list', 'items': ['What is an agent?']}]
+    second = run(changed)
+    emitted = [record for record in second if not record.get('deleted')]
+    deleted = [record for record in second if record.get('deleted')]
+    assert [record['heading_path'] for record in emitted] == [['Quiz']]
+    assert [record['hash'] for record in deleted] == [
+        chunk['hash'] for chunk in first if chunk['heading_path'] == ['Quiz']]
@@ -0,0 +1,45 @@
+import re
+
+import pytest
+from reportlab.lib.styles import ParagraphStyle
+
+from WebScraper.codeblocks import code_flowables
+
+STYLE = ParagraphStyle('Code', fontName='Courier', fontSize=8, leading=10,
+                       spaceBefore=6, spaceAfter=6)
+CONTENT = '\n'.join(f'total = add(total, {i})  # step {i}' for i in range(1, 121))
+
+
+def numbered_lines(flowable):
+    if hasattr(flowable, 'text'):  # XPreformatted, holding markup
+        text = re.sub(r'<[^>]+>', '', flowable.text)
+        return text.replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&').split('\n')
+    return flowable.lines
+
+
+@pytest.mark.parametrize('highlight', [False, True], ids=['plain', 'highlighted'])
+def test_long_block_is_chunked_with_running_line_numbers(highlight):
+    if highlight:
+        pytest.importorskip('pygments')
+    chunks = code_flowables(CONTENT, 'python', STYLE, 200, highlight=highlight)
+    assert len(chunks) > 2
+    assert all(hasattr(chunk, 'text') == highlight for chunk in chunks)
+
+    lines = [line for chunk in chunks for line in numbered_lines(chunk)]
+    assert [int(line.split()[0]) for line in lines] == list(range(1, 121))
+    assert [line.split(' ', 1)[1].lstrip() for line in lines] == CONTENT.split('\n')
+    for chunk in chunks:
+        assert chunk.wrap(400, 1000)[1] <= 200
+
+
+def test_only_the_ends_keep_their_spacing():
+    chunks = code_flowables(CONTENT, 'python', STYLE, 200)
+    assert chunks[0].style.spaceBefore == 6 and chunks[0].style.spaceAfter == 0
+    assert all(chunk.style.spaceBefore == chunk.style.spaceAfter == 0 for chunk in chunks[1:-1])
+    assert chunks[-1].style.spaceBefore == 0 and chunks[-1].style.spaceAfter == 6
+
+
+def test_short_block_is_one_flowable():
+    chunks = code_flowables('print("hi")', 'python', STYLE, 200)
+    assert len(chunks) == 1 and chunks[0].style is STYLE
+    assert numbered_lines(chunks[0]) == ['1   print("hi")']
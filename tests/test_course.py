@@ -0,0 +1,31 @@
+from WebScraper.course import CourseIndex, display_name
+
+BASE = 'https://huggingface.co/learn/llm-course/'
+
+
+def section(path):
+    return {'path': path, 'title': path.title()}
+
+
+def test_next_section_follows_manifest_order():
+    index = CourseIndex(BASE, {
+        'chapter1': {'type': 'main', 'sections': [section('intro'), section('setup')]},
+        'unit1a': {'type': 'main', 'sections': [section('extra')]},
+        'bonus-unit1': {'type': 'bonus', 'sections': [section('fine-tuning')]},
+        'units': {'type': 'main', 'sections': [section('summary')]},
+    })
+    next_urls = {s.url[len(BASE):]: s.next_url and s.next_url[len(BASE):] for s in index}
+    assert next_urls == {
+        'chapter1/intro': 'chapter1/setup',
+        'chapter1/setup': 'unit1a/extra',
+        'unit1a/extra': 'units/summary',  # Bonus units are skipped
+        'bonus-unit1/fine-tuning': None,
+        'units/summary': None,
+    }
+
+
+def test_display_name():
+    assert display_name('unit1') == 'Unit 1'
+    assert display_name('bonus-unit2') == 'Bonus Unit 2'
+    assert display_name('chapter1') == 'Chapter 1'
+    assert display_name('agents-course') == 'Agents Course'
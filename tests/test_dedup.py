@@ -0,0 +1,18 @@
+from WebScraper.dedup import DuplicateDetector
+
+TEXT = ' '.join(f'word{i}' for i in range(30))
+
+
+def page(url, order):
+    return {'url': url, 'title': url.upper(), 'global_order': order, 'content_blocks': []}
+
+
+def test_original_is_earliest_in_course_order():
+    block = {'type': 'paragraph', 'content': TEXT}
+    detector = DuplicateDetector()
+    # Crawled out of course order: the later page is seen first and kept
+    assert detector.check_block(block, page('b', 5)) is None
+    assert detector.check_block(block, page('a', 2)) is None
+    assert detector.check_block(block, page('c', 7)) == ('a', 'A')
+    # A repeat further down the original's own page is still a duplicate
+    assert detector.check_block(block, page('a', 2)) == ('a', 'A')
@@ -0,0 +1,40 @@
+"""Content block extraction against the blocks the original per-heading
+extractor produced for the same pages (tests/fixtures/extraction/*.json)."""
+import json
+import os
+
+import pytest
+from scrapy.http import HtmlResponse
+
+from WebScraper.spiders.website_spider import WebsiteSpider
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'extraction')
+PAGES = sorted(name[:-len('.html')] for name in os.listdir(FIXTURES) if name.endswith('.html'))
+
+
+def load_page(name):
+    with open(os.path.join(FIXTURES, f'{name}.html'), 'rb') as f:
+        body = f.read()
+    return HtmlResponse(url=f'https://huggingface.co/learn/agents-course/unit1/{name}',
+                        body=body, encoding='utf-8')
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_blocks_match_baseline(name):
+    with open(os.path.join(FIXTURES, f'{name}.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    blocks = WebsiteSpider().extract_content_blocks(load_page(name))
+    assert [dict(block) for block in blocks] == expected
+
+
+def test_nested_main_is_walked_once():
+    response = HtmlResponse(
+        url='https://huggingface.co/learn/agents-course/unit1/nested',
+        body=b'<html><body><main><main><h1>Title</h1><p>Once.</p></main></main></body></html>',
+        encoding='utf-8'
+    )
+    blocks = WebsiteSpider().extract_content_blocks(response)
+    assert [dict(block) for block in blocks] == [
+        {'type': 'heading', 'content': 'Title', 'level': 1},
+        {'type': 'paragraph', 'content': 'Once.'},
+    ]
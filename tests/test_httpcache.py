@@ -0,0 +1,85 @@
+import pytest
+from scrapy import Spider
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from WebScraper.httpcache import SQLiteCacheStorage
+
+BASE = 'https://huggingface.co/learn/agents-course/unit1/'
+
+
+@pytest.fixture
+def storage(tmp_path):
+    def open_storage(max_size=0):
+        crawler = get_crawler(Spider, {
+            'HTTPCACHE_DIR': str(tmp_path),
+            'HTTPCACHE_MAX_SIZE': max_size,
+            'HTTPCACHE_COMPRESSION': 'identity',
+        })
+        spider = Spider('website')
+        spider.crawler = crawler
+        storage = SQLiteCacheStorage(crawler.settings)
+        storage.open_spider(spider)
+        opened.append(storage)
+        return storage, spider
+
+    opened = []
+    yield open_storage
+    for storage in opened:
+        storage.close_spider(None)
+
+
+def store(storage, spider, path, body):
+    url = BASE + path
+    storage.store_response(spider, Request(url), HtmlResponse(url, body=body))
+
+
+def count(storage, table):
+    return storage.db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def test_identical_bodies_are_stored_once(storage):
+    storage, spider = storage()
+    store(storage, spider, 'a', b'<p>same page</p>')
+    store(storage, spider, 'b', b'<p>same page</p>')
+    assert count(storage, 'responses') == 2
+    assert count(storage, 'bodies') == 1
+    for path in ('a', 'b'):
+        response = storage.retrieve_response(spider, Request(BASE + path))
+        assert response.body == b'<p>same page</p>'
+        assert response.url == BASE + path
+
+
+def test_replaced_body_is_dropped_with_its_last_reference(storage):
+    storage, spider = storage()
+    store(storage, spider, 'a', b'old')
+    store(storage, spider, 'b', b'old')
+    store(storage, spider, 'a', b'new')
+    # Still used by b
+    assert count(storage, 'bodies') == 2
+    store(storage, spider, 'b', b'new')
+    assert count(storage, 'bodies') == 1
+    assert storage.size == storage._stored_size()
+
+
+def test_least_recently_used_responses_are_evicted(storage):
+    storage, spider = storage(max_size=13000)
+    for index in range(4):
+        store(storage, spider, f'page{index}', bytes([65 + index]) * 3000)
+    # page0 is read, so page1 is the least recently used
+    assert storage.retrieve_response(spider, Request(BASE + 'page0')) is not None
+    store(storage, spider, 'page4', b'E' * 3000)
+
+    kept = {path for path in (f'page{index}' for index in range(5))
+            if storage.retrieve_response(spider, Request(BASE + path)) is not None}
+    assert 'page0' in kept and 'page4' in kept
+    assert 'page1' not in kept
+    assert storage.size == storage._stored_size() <= 13000
+    assert spider.crawler.stats.get_value('httpcache/evicted') >= 1
+
+
+def test_stored_responses_are_committed(storage):
+    first, spider = storage()
+    store(first, spider, 'a', b'persisted')
+    second, spider = storage()
+    assert second.retrieve_response(spider, Request(BASE + 'a')).body == b'persisted'
@@ -0,0 +1,70 @@
+import pytest
+from itemadapter import ItemAdapter
+
+from WebScraper.items import Block, ContentBlock, Page, WebscraperItem
+
+BLOCKS = [
+    {'type': 'heading', 'content': 'What are Tools?', 'level': 2},
+    {'type': 'paragraph', 'content': 'A tool is a function given to the LLM.'},
+    {'type': 'code', 'content': 'def add(a, b):\n    return a + b', 'language': 'python'},
+    {'type': 'list', 'items': ['Web search', 'Image generation'], 'level': 1},
+    {'type': 'reference', 'content': 'Same paragraph as in Introduction',
+     'parent': 'https://huggingface.co/learn/agents-course/unit1/introduction'},
+    {'type': 'table', 'content': [['Tool', 'Use'], ['search', 'Fetch pages']]},
+]
+
+PAGE = {
+    'url': 'https://huggingface.co/learn/agents-course/unit1/tools',
+    'title': 'What are Tools?',
+    'course': 'agents-course',
+    'content_blocks': BLOCKS,
+    'depth': 2,
+    'parent_url': 'https://huggingface.co/learn/agents-course/unit1/introduction',
+    'unit': 'unit1',
+    'unit_order': 3,
+    'section_type': 'main',
+    'section_number': '1.3',
+    'is_optional': False,
+    'is_quiz': False,
+    'is_conclusion': False,
+    'lesson_type': 'Lesson',
+    'global_order': 7,
+    'unchanged': False,
+}
+
+
+def scrapy_item():
+    item = WebscraperItem(PAGE)
+    item['content_blocks'] = [ContentBlock(block) for block in BLOCKS]
+    return item
+
+
+@pytest.mark.parametrize('source', [lambda: PAGE, scrapy_item], ids=['dict', 'item'])
+def test_page_round_trip(source):
+    page = Page.from_item(source())
+    assert all(isinstance(block, Block) for block in page['content_blocks'])
+    assert ItemAdapter(page).asdict() == PAGE
+
+
+@pytest.mark.parametrize('block', BLOCKS, ids=[block['type'] for block in BLOCKS])
+def test_block_keeps_only_fields_that_are_set(block):
+    compact = Block.from_item(block)
+    assert ItemAdapter(compact).asdict() == block
+    assert dict(compact.to_item()) == block
+
+
+def test_to_item_restores_scrapy_items():
+    item = Page.from_item(PAGE).to_item()
+    assert isinstance(item, WebscraperItem)
+    assert all(isinstance(block, ContentBlock) for block in item['content_blocks'])
+    assert ItemAdapter(item).asdict() == PAGE
+
+
+def test_partial_page_keeps_missing_fields_missing():
+    page = Page.from_item({'url': PAGE['url'], 'content_blocks': BLOCKS[:1]})
+    assert ItemAdapter(page).asdict() == {'url': PAGE['url'], 'content_blocks': BLOCKS[:1]}
+    assert 'title' not in page.to_item()
+    with pytest.raises(KeyError):
+        page['title']
+    with pytest.raises(KeyError):
+        page['summary'] = 'not a field'
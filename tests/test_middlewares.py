@@ -0,0 +1,34 @@
+import pytest
+from scrapy import Spider
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Headers, Request, Response
+from scrapy.utils.test import get_crawler
+
+from WebScraper.middlewares import AssetFilterMiddleware
+
+URL = 'https://huggingface.co/learn/agents-course/unit1/introduction'
+
+
+@pytest.fixture
+def middleware():
+    return AssetFilterMiddleware(get_crawler(Spider).stats)
+
+
+@pytest.mark.parametrize('status', [301, 302, 304, 307])
+def test_redirects_and_not_modified_pass(middleware, status):
+    request = Request(URL)
+    response = Response(URL, status=status, headers={'Content-Type': 'text/plain', 'Location': URL + '/'})
+    assert middleware.process_response(request, response, None) is response
+
+
+def test_redirect_headers_are_not_rejected(middleware):
+    request = Request(URL)
+    middleware.headers_received(Headers({'Content-Type': 'text/plain', 'Location': URL + '/'}),
+                                0, request, None)
+    assert 'asset_rejected' not in request.meta
+
+
+def test_non_html_page_is_rejected(middleware):
+    response = Response(URL, headers={'Content-Type': 'text/plain'})
+    with pytest.raises(IgnoreRequest):
+        middleware.process_response(Request(URL), response, None)
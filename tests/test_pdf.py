@@ -0,0 +1,115 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+from pypdf import PdfReader
+
+from WebScraper.checkpoint import CrawlCheckpoint
+from WebScraper.pdf import WebscraperPipeline
+
+UNITS = [('unit0', 'main'), ('bonus-unit1', 'bonus'), ('unit1', 'main')]
+
+
+def items():
+    order = 0
+    for unit, section_type in UNITS:
+        for unit_order in (1, 2):
+            yield {
+                'url': f'https://huggingface.co/learn/agents-course/{unit}/page{unit_order}',
+                'title': f'{unit} page {unit_order}',
+                'course': 'agents-course',
+                'unit': unit,
+                'unit_order': unit_order,
+                'global_order': order,
+                'section_type': section_type,
+                'content_blocks': [{'type': 'paragraph', 'content': f'Text of {unit} {unit_order}'}],
+            }
+            order += 1
+
+
+def build(tmp_path, name, **kwargs):
+    output = str(tmp_path / f'{name}.pdf')
+    pipeline = WebscraperPipeline(output=output, **kwargs)
+    for item in items():
+        pipeline.process_item(item, None)
+    pipeline.close_spider(None)
+    return [page.extract_text() for page in PdfReader(output).pages]
+
+
+@pytest.mark.parametrize('include_bonus', [False, True])
+def test_worker_count_does_not_change_the_units(tmp_path, include_bonus):
+    single = build(tmp_path, 'single', include_bonus=include_bonus)
+    parallel = build(tmp_path, 'parallel', include_bonus=include_bonus, render_workers=2)
+    assert single == parallel
+    text = '\n'.join(single)
+    assert ('bonus-unit1 page 1' in text) == include_bonus
+    assert 'unit1 page 2' in text
+
+
+def test_restored_items_name_the_pdf(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path / 'checkpoint.sqlite3'))
+    for item in items():
+        checkpoint.add_item(item['url'], [item['global_order']], item)
+    spider = SimpleNamespace(checkpoint=checkpoint, courses={'agents-course': 'unused'})
+    output = str(tmp_path / 'resumed.pdf')
+
+    pipeline = WebscraperPipeline(output=output)
+    pipeline.open_spider(spider)
+    pipeline.close_spider(spider)
+    assert PdfReader(output).pages[0].extract_text().startswith('Agents Course')
+
+
+def sectioned_items():
+    # Long enough that each second heading lands a page after the first
+    for order, unit in enumerate(['unit0', 'unit1']):
+        yield {
+            'url': f'https://huggingface.co/learn/agents-course/{unit}/tools',
+            'title': f'{unit} tools',
+            'course': 'agents-course',
+            'unit': unit,
+            'unit_order': 1,
+            'global_order': order,
+            'section_type': 'main',
+            'content_blocks': [
+                {'type': 'heading', 'content': f'{unit} overview', 'level': 1},
+                *({'type': 'paragraph', 'content': f'Paragraph {i} of {unit}. ' * 60} for i in range(6)),
+                {'type': 'heading', 'content': f'{unit} details', 'level': 2},
+                {'type': 'paragraph', 'content': 'The end.'},
+            ],
+        }
+
+
+@pytest.mark.parametrize('incremental', [False, True], ids=['single-pass', 'fragments'])
+def test_outline_and_toc_point_at_the_headings(tmp_path, incremental):
+    output = str(tmp_path / 'outline.pdf')
+    cache = {'fragment_cache_dir': str(tmp_path / 'fragments')} if incremental else {}
+    pipeline = WebscraperPipeline(output=output, **cache)
+    for item in sectioned_items():
+        pipeline.process_item(item, None)
+    pipeline.close_spider(None)
+
+    reader = PdfReader(output)
+    texts = [page.extract_text() for page in reader.pages]
+    headings = ['unit0 overview', 'unit0 details', 'unit1 overview', 'unit1 details']
+
+    # Bookmarks nest the level 2 headings and jump to the page each is on
+    bookmarks = []
+    for entry in reader.outline:
+        children = entry if isinstance(entry, list) else [entry]
+        for child in children:
+            bookmarks.append((child.title, isinstance(entry, list),
+                              reader.get_destination_page_number(child)))
+    assert [(title, nested) for title, nested, _ in bookmarks] == [
+        (title, 'details' in title) for title in headings]
+    for title, _, page_index in bookmarks:
+        assert title in texts[page_index]
+    assert bookmarks[1][2] == bookmarks[0][2] + 1
+
+    # The table of contents lists the same pages, numbered from 1, and
+    # links every entry
+    toc = texts[1]
+    assert toc.count('Table of Contents') == 1
+    listed = re.findall(r'(unit\d \w+)\n(\d+)', toc)
+    assert listed == [(title, str(page_index + 1)) for title, _, page_index in bookmarks]
+    links = [annotation.get_object() for annotation in reader.pages[1].get('/Annots', [])]
+    assert sum(link['/Subtype'] == '/Link' for link in links) == len(headings)
@@ -0,0 +1,47 @@
+import os
+import random
+
+from WebScraper.items import Page
+from WebScraper.spill import ItemSpillBuffer
+
+INF = float('inf')
+
+
+def test_spilled_items_come_back_in_key_order(tmp_path):
+    keys = [[group, order, f'unit{order % 5}', order, order]
+            for group in (0, 1) for order in range(40)]
+    shuffled = list(keys)
+    random.Random(0).shuffle(shuffled)
+
+    buffer = ItemSpillBuffer(threshold=7, directory=str(tmp_path))
+    for key in shuffled:
+        buffer.add(key, {'url': f'https://example.com/{key[0]}/{key[1]}'})
+    assert len(buffer.segments) == len(keys) // 7
+    assert buffer.pending  # A tail that never reached the disk
+
+    records = list(buffer)
+    assert [key for key, _ in records] == sorted(keys)
+    assert [item['url'] for _, item in records] == [
+        f'https://example.com/{key[0]}/{key[1]}' for key in sorted(keys)]
+    # Iterating again streams the same items
+    assert [key for key, _ in buffer] == sorted(keys)
+
+
+def test_infinite_keys_survive_the_json_round_trip(tmp_path):
+    keys = [[1, 0, 'depth_1', INF, INF], [0, 3, 'unit1', 2, 4], [0, 3, 'unit1', INF, 5],
+            [0, 0, 'unit0', 1, 0], [1, 0, 'depth_0', INF, INF]]
+    buffer = ItemSpillBuffer(threshold=2, directory=str(tmp_path))
+    for index, key in enumerate(keys):
+        buffer.add(key, Page(url=f'https://example.com/{index}', global_order=key[4]))
+
+    records = list(buffer)
+    assert [key for key, _ in records] == sorted(keys)
+    assert [item['global_order'] for _, item in records] == [key[4] for key in sorted(keys)]
+
+
+def test_close_removes_its_temporary_directory():
+    buffer = ItemSpillBuffer(threshold=1)
+    buffer.add([0], {'url': 'https://example.com/'})
+    directory = buffer.directory
+    buffer.close()
+    assert not os.path.exists(directory)
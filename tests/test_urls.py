@@ -0,0 +1,58 @@
+import pytest
+
+from WebScraper.urls import SeenSet, canonicalize_url
+
+PAGE = 'https://huggingface.co/learn/agents-course/unit1/tools'
+
+
+@pytest.mark.parametrize('url', [
+    PAGE,
+    PAGE + '/',
+    PAGE + '//',
+    PAGE + '#what-are-tools',
+    PAGE + '/#what-are-tools',
+    PAGE + '?fw=pt',
+    PAGE + '?utm_source=newsletter&utm_medium=email',
+    PAGE + '?ref=hub&fbclid=abc&gclid=def',
+    'HTTPS://HuggingFace.co/learn/agents-course/unit1/tools',
+])
+def test_variants_of_a_page_are_one_url(url):
+    assert canonicalize_url(url) == PAGE
+
+
+def test_content_parameters_are_kept_and_sorted():
+    assert (canonicalize_url(PAGE + '?b=2&utm_campaign=x&a=1#top')
+            == PAGE + '?a=1&b=2')
+    assert canonicalize_url(PAGE + '?q=') == PAGE + '?q='
+
+
+def test_path_case_is_kept_and_root_keeps_its_slash():
+    assert canonicalize_url('https://huggingface.co/Learn') == 'https://huggingface.co/Learn'
+    assert canonicalize_url('https://huggingface.co') == 'https://huggingface.co/'
+    assert canonicalize_url('https://huggingface.co/#top') == 'https://huggingface.co/'
+
+
+def test_seen_set_is_exact_up_to_its_limit():
+    seen = SeenSet(exact_limit=100)
+    urls = [f'{PAGE}/{i}' for i in range(100)]
+    for url in urls:
+        seen.add(url)
+    assert seen.bloom is None
+    assert len(seen) == 100
+    assert all(url in seen for url in urls)
+    assert f'{PAGE}/100' not in seen
+
+
+def test_seen_set_moves_to_a_bloom_filter_past_its_limit():
+    seen = SeenSet([f'{PAGE}/{i}' for i in range(100)], exact_limit=100)
+    seen.add(f'{PAGE}/100')
+    assert seen.bloom is not None
+    assert not seen.exact
+    assert len(seen) == 101
+    # No false negatives, for entries added before or after the switch
+    for i in range(1000):
+        seen.add(f'{PAGE}/{i}')
+    assert all(f'{PAGE}/{i}' in seen for i in range(1000))
+    assert len(seen.bloom.filters) > 1  # Grew past its first filter
+    false_positives = sum(f'{PAGE}/other/{i}' in seen for i in range(10000))
+    assert false_positives <= 5